@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+"""Build several configurations of opencascade concurrently, within a cores & memory budget.
+
+Usage: build_matrix.py MATRIX_FILE [--cores N] [--memory-gb GB] [--cpus-per-job N] [--memory-per-job-gb GB]
+                                   [--sources-cache DIR] [--sources-url URL] [--logs DIR] [--no-test]
+
+MATRIX_FILE is a JSON list of configurations:
+
+    [
+        {"name": "gcc-release-static", "profile": "default", "settings": {"build_type": "Release"}},
+        {"name": "gcc-release-shared-tbb", "profile": "default", "options": {"shared": true, "with_tbb": true}}
+    ]
+
+The recipe is exported once, so its sources folder in conan cache is shared by all configurations,
+each one only patches and builds its own copy. Sources tarball is fetched by source() of the recipe
+(OPENCASCADE_SOURCES_URL, file:// URLs allowed) into its sha256-verified OPENCASCADE_SOURCES_CACHE.
+
+Compiler cache statistics printed by concurrent builds sharing a profile mix their hits & misses.
+
+Packages are built concurrently, then test_package is run for each configuration one after the
+other, so that its benchmarks & link time measurements are not disturbed by other jobs.
+"""
+
+import argparse
+import concurrent.futures
+import json
+import os
+import subprocess
+import sys
+import time
+
+import yaml
+
+RECIPE_FOLDER = os.path.dirname(os.path.abspath(__file__))
+
+
+def _load_version():
+    with open(os.path.join(RECIPE_FOLDER, "conandata.yml")) as conandata_file:
+        conandata = yaml.safe_load(conandata_file)
+    return next(iter(conandata["sources"]))
+
+
+def _get_total_memory_gb():
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / float(1024 ** 3)
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def _conan_args(configuration):
+    conan_args = ["--profile", configuration.get("profile", "default")]
+    for setting, value in configuration.get("settings", {}).items():
+        conan_args += ["--settings", "{}={}".format(setting, value)]
+    for option, value in configuration.get("options", {}).items():
+        conan_args += ["--options", "opencascade:{}={}".format(option, value)]
+    return conan_args
+
+
+def _run_step(step, command, configuration, env, args):
+    log_path = os.path.join(args.logs, "{}-{}.log".format(configuration["name"], step))
+    start = time.time()
+    with open(log_path, "w") as log:
+        log.write("$ {}\n".format(" ".join(command)))
+        log.flush()
+        returncode = subprocess.call(command, stdout=log, stderr=subprocess.STDOUT, env=env, cwd=RECIPE_FOLDER)
+    result = {"name": configuration["name"], "step": step, "returncode": returncode,
+              "duration_s": time.time() - start, "log": log_path}
+    print("{:<40} {:<6} {:<6} {:8.0f} s  {}".format(result["name"], step, "OK" if returncode == 0 else "FAILED",
+                                                   result["duration_s"], log_path))
+    return result
+
+
+def _build_configuration(configuration, reference, env, args):
+    command = ["conan", "install", reference, "--build", "opencascade", "--build", "missing"] + _conan_args(configuration)
+    return _run_step("build", command, configuration, env, args)
+
+
+def _test_configuration(configuration, reference, env, args):
+    command = ["conan", "test", os.path.join(RECIPE_FOLDER, "test_package"), reference] + _conan_args(configuration)
+    return _run_step("test", command, configuration, env, args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("matrix")
+    parser.add_argument("--cores", type=int, default=os.cpu_count())
+    parser.add_argument("--memory-gb", type=float, default=_get_total_memory_gb())
+    parser.add_argument("--cpus-per-job", type=int, default=4)
+    parser.add_argument("--memory-per-job-gb", type=float, default=8.0)
+    parser.add_argument("--sources-cache", default=os.path.join(os.path.expanduser("~"), ".opencascade_sources"))
+    parser.add_argument("--sources-url", default=None, help="Overrides URL of conandata.yml, file:// URLs allowed")
+    parser.add_argument("--logs", default=os.path.join(RECIPE_FOLDER, "build_matrix_logs"))
+    parser.add_argument("--no-test", action="store_true", help="Do not run test_package")
+    args = parser.parse_args()
+
+    with open(args.matrix) as matrix_file:
+        configurations = json.load(matrix_file)
+    names = [configuration["name"] for configuration in configurations]
+    if len(set(names)) != len(names):
+        raise RuntimeError("Configuration names must be unique")
+
+    # Jobs running concurrently, each one with its share of cores & memory
+    max_jobs = args.cores // args.cpus_per_job
+    if args.memory_gb:
+        max_jobs = min(max_jobs, int(args.memory_gb // args.memory_per_job_gb))
+    max_jobs = max(1, min(max_jobs, len(configurations)))
+    print("{} configurations, {} concurrent jobs of {} cores & {:.1f} GB".format(
+          len(configurations), max_jobs, args.cpus_per_job, args.memory_per_job_gb))
+
+    env = dict(os.environ)
+    env["CONAN_CPU_COUNT"] = str(args.cpus_per_job)
+    env["OPENCASCADE_BUILD_MEMORY_GB"] = str(args.memory_per_job_gb)
+    env["OPENCASCADE_SOURCES_CACHE"] = args.sources_cache
+    if args.sources_url:
+        env["OPENCASCADE_SOURCES_URL"] = args.sources_url
+
+    # Exported once: concurrent exports would reset sources folder of the reference in conan cache.
+    # Sources are retrieved once by the first build, conan locks sources folder of the reference meanwhile
+    reference = "opencascade/{}@".format(_load_version())
+    subprocess.check_call(["conan", "export", RECIPE_FOLDER, reference], env=env)
+
+    os.makedirs(args.logs, exist_ok=True)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_jobs) as executor:
+        build_results = list(executor.map(lambda configuration: _build_configuration(configuration, reference, env, args),
+                                          configurations))
+    results = list(build_results)
+
+    if not args.no_test:
+        # Whole machine is available to test_package, its benchmarks must not be limited to cores of a build job
+        test_env = dict(env)
+        del test_env["CONAN_CPU_COUNT"]
+        for configuration, build_result in zip(configurations, build_results):
+            if build_result["returncode"] == 0:
+                results.append(_test_configuration(configuration, reference, test_env, args))
+
+    with open(os.path.join(args.logs, "summary.json"), "w") as summary_file:
+        json.dump(sorted(results, key=lambda result: names.index(result["name"])), summary_file, indent=4)
+    return 1 if any(result["returncode"] != 0 for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
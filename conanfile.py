@@ -1,7 +1,14 @@
 from conans import ConanFile, CMake, tools
-from conans.errors import ConanInvalidConfiguration
+from conans.errors import ConanException, ConanInvalidConfiguration
+from io import StringIO
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+import hashlib
+import csv
 import json
 import os
+import shutil
+import sys
 import textwrap
 
 required_conan_version = ">=1.33.0"
@@ -25,6 +32,33 @@ class OpenCascadeConan(ConanFile):
         "with_openvr": [True, False],
         "with_rapidjson": [True, False],
         "with_tbb": [True, False],
+        "parallel_backend": ["tbb", "occt"],
+        "allocator": ["system", "occt", "tbb"],
+        "with_modeling_data": [True, False],
+        "with_modeling_algorithms": [True, False],
+        "with_visualization": [True, False],
+        "with_application_framework": [True, False],
+        "with_data_exchange": [True, False],
+        "with_draw": [True, False],
+        # Experimental: full builds of OCCT with use_pch or unity_build have not been validated yet
+        "use_pch": [True, False],
+        "unity_build": [True, False],
+        "unity_build_batch_size": "ANY",
+        "lto": [True, False],
+        "pgo": [True, False],
+        "use_ninja": [True, False],
+        "memory_aware_build": [True, False],
+        "gc_sections": [True, False],
+        "optimize_dynamic_loading": [True, False],
+        # Do not package resource files which have a compiled-in copy (see _embedded_resources). It doesn't
+        # change OCCT build: StdResource & XSTEPResource (CSF_STEPDefaults, CSF_IGESDefaults...) have no
+        # compiled-in copy, they are still packaged and read from disk
+        "embed_resources": [True, False],
+        "build_profile": [True, False],
+        "split_dwarf": [True, False],
+        "compress_debug_sections": [True, False],
+        "separate_debug_info": [True, False],
+        "cpu_target": ["x86-64", "x86-64-v2", "x86-64-v3", "x86-64-v4"],
         "extended_debug_messages": [True, False],
     }
     default_options = {
@@ -35,14 +69,41 @@ class OpenCascadeConan(ConanFile):
         "with_openvr": False,
         "with_rapidjson": False,
         "with_tbb": False,
+        "parallel_backend": "tbb",
+        "allocator": "system",
+        "with_modeling_data": True,
+        "with_modeling_algorithms": True,
+        "with_visualization": True,
+        "with_application_framework": True,
+        "with_data_exchange": True,
+        "with_draw": True,
+        "use_pch": False,
+        "unity_build": False,
+        "unity_build_batch_size": 8,
+        "lto": False,
+        "pgo": False,
+        "use_ninja": False,
+        "memory_aware_build": False,
+        "gc_sections": False,
+        "optimize_dynamic_loading": False,
+        "embed_resources": False,
+        "build_profile": False,
+        "split_dwarf": False,
+        "compress_debug_sections": False,
+        "separate_debug_info": False,
+        "cpu_target": "x86-64",
         "extended_debug_messages": False,
     }
 
     short_paths = True
 
     generators = "cmake"
-    exports_sources = "patches/**"
+    exports_sources = ["patches/**", "pgo/**", "scripts/occt_build_timer.py"]
     _cmake = None
+    _compiler_cache_resolved = None
+    # Parsed components manifests, package_info() may be called many times by a single conan process
+    _modules_manifest_cache = {}
+    _modules_manifest_version = 2
 
     @property
     def _source_subfolder(self):
@@ -52,51 +113,295 @@ class OpenCascadeConan(ConanFile):
     def _is_linux(self):
         return self.settings.os in ["Linux", "FreeBSD"]
 
+    @property
+    def _modules_options(self):
+        # FoundationClasses is always built
+        return {
+            "ModelingData": "with_modeling_data",
+            "ModelingAlgorithms": "with_modeling_algorithms",
+            "Visualization": "with_visualization",
+            "ApplicationFramework": "with_application_framework",
+            "DataExchange": "with_data_exchange",
+            "Draw": "with_draw",
+        }
+
+    @property
+    def _modules_dependencies(self):
+        # Coarse dependencies between modules, deduced from adm/MODULES and src/*/EXTERNLIB.
+        # They can't be computed from source code in requirements(), so they are hardcoded here
+        # and checked against source code at build time.
+        # Some toolkits of ApplicationFramework (TKVCAF) & DataExchange (TKXCAF) depend on
+        # Visualization toolkits (TKService, TKV3d), so DataExchange always brings Visualization
+        # requirements (freetype, opengl, fontconfig, xorg).
+        return {
+            "FoundationClasses": [],
+            "ModelingData": ["FoundationClasses"],
+            "ModelingAlgorithms": ["ModelingData"],
+            "Visualization": ["ModelingAlgorithms"],
+            "ApplicationFramework": ["Visualization"],
+            "DataExchange": ["ApplicationFramework"],
+            "Draw": ["DataExchange"],
+        }
+
+    @property
+    def _enabled_modules(self):
+        return ["FoundationClasses"] + [module for module, option in self._modules_options.items()
+                                        if self.options.get_safe(option)]
+
+    @property
+    def _required_modules(self):
+        required_modules = set()
+        modules_to_visit = list(self._enabled_modules)
+        while modules_to_visit:
+            module = modules_to_visit.pop()
+            if module not in required_modules:
+                required_modules.add(module)
+                modules_to_visit.extend(self._modules_dependencies[module])
+        return required_modules
+
+    @property
+    def _link_tcl_tk(self):
+        return "Draw" in self._required_modules
+
+    @property
+    def _link_visualization_deps(self):
+        # freetype, opengl, fontconfig & xorg
+        return "Visualization" in self._required_modules
+
+    @property
+    def _is_elf(self):
+        return self.settings.os in ["Linux", "FreeBSD", "Android"]
+
+    @property
+    def _no_unity_build_toolkits(self):
+        # Draw commands are implemented with many file-local helpers sharing the same names
+        # across translation units, they can't be merged in unity sources.
+        # This list comes from source inspection, not from a full unity build of OCCT (unity_build is experimental)
+        return ["TKDraw", "TKTopTest", "TKViewerTest", "TKXSDRAW", "TKDCAF", "TKXDEDRAW",
+                "TKTObjDRAW", "TKQADraw", "TKIVtkDraw"]
+
+    @property
+    def _heavy_toolkits(self):
+        # Toolkits with translation units requiring much more memory than others to compile
+        return ["TKBO", "TKBool", "TKSTEPBase", "TKSTEPAttr", "TKSTEP209", "TKSTEP", "TKXDESTEP", "TKV3d"]
+
+    @property
+    def _use_ninja(self):
+        # Job pools are only supported by Ninja generator
+        return self.options.use_ninja or self.options.memory_aware_build
+
+    @property
+    def _resources_env_vars(self):
+        # Environment variables used by OCCT to find resource files (see adm/templates/env.sh),
+        # and their location relative to resources folder
+        return {
+            "CSF_OCCTResourcePath": "",
+            "CSF_ShadersDirectory": "Shaders",
+            "CSF_MDTVTexturesDirectory": "Textures",
+            "CSF_SHMessage": "SHMessage",
+            "CSF_XSMessage": "XSMessage",
+            "CSF_TObjMessage": "TObj",
+            "CSF_UnitsLexicon": os.path.join("UnitsAPI", "Lexi_Expr.dat"),
+            "CSF_UnitsDefinition": os.path.join("UnitsAPI", "Units.dat"),
+            "CSF_StandardDefaults": "StdResource",
+            "CSF_StandardLiteDefaults": "StdResource",
+            "CSF_PluginDefaults": "StdResource",
+            "CSF_XCAFDefaults": "StdResource",
+            "CSF_TObjDefaults": "StdResource",
+            "CSF_MIGRATION_TYPES": os.path.join("StdResource", "MigrationSheet.txt"),
+            "CSF_IGESDefaults": "XSTEPResource",
+            "CSF_STEPDefaults": "XSTEPResource",
+            "CSF_XmlOcafResource": "XmlOcafResource",
+            "CSF_DrawPluginDefaults": "DrawResources",
+            "DRAWHOME": "DrawResources",
+        }
+
+    @property
+    def _embedded_resources(self):
+        # Resources always compiled into libraries (*.pxx files), used by OCCT if their environment variable is not set.
+        # Textures is not listed: only Textures_EnvLUT.pxx is embedded, predefined 2d_*.rgb & env_*.rgb textures
+        # are always loaded from CSF_MDTVTexturesDirectory
+        return ["Shaders", "SHMessage", "XSMessage", "TObj", "UnitsAPI"]
+
+    @property
+    def _resources_folder(self):
+        return os.path.join("res", "resource")
+
+    @property
+    def _mmgt_opt(self):
+        # Value of MMGT_OPT environment variable read by Standard_MMgrFactory
+        return {"system": 0, "occt": 1, "tbb": 2}[str(self.options.allocator)]
+
+    @property
+    def _csf_to_conan_requirement(self):
+        # External libraries from EXTERNLIB files which must be provided by a conan requirement
+        return {
+            "CSF_FREETYPE": "freetype",
+            "CSF_OpenGlLibs": "opengl",
+            "CSF_TclLibs": "tcl",
+            "CSF_TclTkLibs": "tk",
+            "CSF_fontconfig": "fontconfig" if self._is_linux else None,
+            "CSF_XwLibs": "xorg" if self._is_linux else None,
+            "CSF_FFmpeg": "ffmpeg" if self.options.get_safe("with_ffmpeg") else None,
+            "CSF_FreeImagePlus": "freeimage" if self.options.get_safe("with_freeimage") else None,
+            "CSF_OpenVR": "openvr" if self.options.get_safe("with_openvr") else None,
+            "CSF_RapidJSON": "rapidjson" if self.options.get_safe("with_rapidjson") else None,
+            "CSF_TBB": "tbb" if self.options.with_tbb else None,
+        }
+
     def config_options(self):
         if self.settings.os == "Windows":
             del self.options.fPIC
+            del self.options.optimize_dynamic_loading
         if self.settings.build_type != "Debug":
             del self.options.extended_debug_messages
+        if self.settings.arch != "x86_64":
+            del self.options.cpu_target
+        # Debug info layout options only make sense for ELF binaries with debug info
+        if not self._is_elf or self.settings.build_type not in ["Debug", "RelWithDebInfo"]:
+            del self.options.split_dwarf
+            del self.options.compress_debug_sections
+            del self.options.separate_debug_info
 
     def configure(self):
         if self.options.shared:
             del self.options.fPIC
+        else:
+            del self.options.optimize_dynamic_loading
+            # .dwo files & separated debug info are attached to linked binaries, not to static libs
+            if self.options.get_safe("split_dwarf") is not None:
+                del self.options.split_dwarf
+                del self.options.separate_debug_info
         if self.settings.compiler.get_safe("cppstd"):
             tools.check_min_cppstd(self, 11)
+        # Modules required by enabled modules are built anyway, their options must reflect it
+        # (same binaries under a single package id, and consumers can rely on these options)
+        required_modules = self._required_modules
+        for module, option in self._modules_options.items():
+            if module in required_modules and self.options.get_safe(option) is not None:
+                setattr(self.options, option, True)
+        # Options of external libs only used by modules which are not built
+        if not self._link_visualization_deps:
+            del self.options.with_ffmpeg
+            del self.options.with_freeimage
+            del self.options.with_openvr
+        if "DataExchange" not in self._required_modules:
+            del self.options.with_rapidjson
+        if not self.options.unity_build:
+            del self.options.unity_build_batch_size
+        # Without TBB, OSD_Parallel always relies on OSD_ThreadPool
+        if not self.options.with_tbb:
+            del self.options.parallel_backend
 
     def requirements(self):
-        self.requires("tcl/8.6.10")
-        self.requires("tk/8.6.10")
-        self.requires("freetype/2.10.4")
-        self.requires("opengl/system")
-        if self._is_linux:
-            self.requires("fontconfig/2.13.93")
-            self.requires("xorg/system")
+        if self._link_tcl_tk:
+            self.requires("tcl/8.6.10")
+            self.requires("tk/8.6.10")
+        if self._link_visualization_deps:
+            self.requires("freetype/2.10.4")
+            self.requires("opengl/system")
+            if self._is_linux:
+                self.requires("fontconfig/2.13.93")
+                self.requires("xorg/system")
         # TODO: add ffmpeg & freeimage support (also vtk?)
-        if self.options.with_ffmpeg:
+        if self.options.get_safe("with_ffmpeg"):
             raise ConanInvalidConfiguration("ffmpeg recipe not yet available in CCI")
-        if self.options.with_freeimage:
+        if self.options.get_safe("with_freeimage"):
             raise ConanInvalidConfiguration("freeimage recipe not yet available in CCI")
-        if self.options.with_openvr:
+        if self.options.get_safe("with_openvr"):
             self.requires("openvr/1.14.15")
-        if self.options.with_rapidjson:
+        if self.options.get_safe("with_rapidjson"):
             self.requires("rapidjson/1.1.0")
         if self.options.with_tbb:
             self.requires("tbb/2020.3")
 
+    def package_id(self):
+        # Build speed-up options, they don't change the resulting binaries.
+        # use_pch & unity_build stay in package id: they are experimental, and merged translation units may
+        # change behavior (colliding file-local symbols), so their binaries must not be served by default
+        del self.info.options.use_ninja
+        del self.info.options.memory_aware_build
+
+    def build_requirements(self):
+        if self.options.unity_build or self.options.lto or self.options.memory_aware_build:
+            # CMAKE_UNITY_BUILD requires CMake >= 3.16, CMAKE_INTERPROCEDURAL_OPTIMIZATION CMake >= 3.9,
+            # CMAKE_JOB_POOLS CMake >= 3.11
+            self.build_requires("cmake/3.19.8")
+        if self._use_ninja:
+            self.build_requires("ninja/1.10.2")
+
     def validate(self):
+        if self.options.unity_build:
+            batch_size = str(self.options.unity_build_batch_size)
+            if not batch_size.isdigit() or int(batch_size) < 1:
+                raise ConanInvalidConfiguration("unity_build_batch_size must be a positive integer")
+        if self.options.lto and self.settings.compiler == "gcc" and tools.Version(self.settings.compiler.version) < "5":
+            raise ConanInvalidConfiguration("lto option requires gcc >= 5")
+        if self.options.allocator == "tbb" and not self.options.with_tbb:
+            raise ConanInvalidConfiguration("allocator=tbb requires with_tbb=True")
+        if self.options.pgo:
+            if self.settings.compiler not in ["gcc", "clang", "apple-clang"]:
+                raise ConanInvalidConfiguration("pgo option is only supported with gcc, clang and apple-clang")
+            if self.settings.compiler == "gcc" and tools.Version(self.settings.compiler.version) < "7":
+                raise ConanInvalidConfiguration("pgo option requires gcc >= 7")
+            if tools.cross_building(self):
+                raise ConanInvalidConfiguration("pgo option can't be used when cross-building, training workload must run on build machine")
+            if not self.options.with_data_exchange:
+                raise ConanInvalidConfiguration("pgo option requires with_data_exchange, training workload reads and writes STEP & IGES files")
+        if (self.options.get_safe("split_dwarf") or self.options.get_safe("compress_debug_sections")) and \
+           self.settings.compiler not in ["gcc", "clang"]:
+            raise ConanInvalidConfiguration("split_dwarf and compress_debug_sections options are only supported with gcc and clang")
+        cpu_target = self.options.get_safe("cpu_target")
+        if cpu_target and cpu_target != "x86-64":
+            if self.settings.compiler not in ["gcc", "clang", "apple-clang", "Visual Studio"]:
+                raise ConanInvalidConfiguration("cpu_target option is only supported with gcc, clang, apple-clang and Visual Studio")
+            if cpu_target == "x86-64-v4" and self.settings.compiler == "Visual Studio" and \
+               tools.Version(self.settings.compiler.version) < "15":
+                raise ConanInvalidConfiguration("cpu_target=x86-64-v4 requires Visual Studio >= 15 (/arch:AVX512)")
         if self.settings.compiler == "clang" and self.settings.compiler.version == "6.0" and \
            self.settings.build_type == "Release":
             raise ConanInvalidConfiguration("OpenCASCADE {} doesn't support Clang 6.0 if Release build type".format(self.version))
 
+    def _get_sources_tarball(self, cache_folder, url, sha256):
+        # Tarballs are stored by checksum, and verified each time they are used
+        tarball = os.path.join(cache_folder, "{}-{}-{}.tar.gz".format(self.name, self.version, sha256[:16]))
+        if not os.path.isfile(tarball):
+            tools.mkdir(cache_folder)
+            # Concurrent builds may fetch at the same time, so tarball is moved to its final name once complete
+            partial_tarball = "{}.{}.part".format(tarball, os.getpid())
+            if url.startswith("file://"):
+                shutil.copyfile(url2pathname(urlparse(url).path), partial_tarball)
+            else:
+                tools.download(url, partial_tarball)
+            tools.check_sha256(partial_tarball, sha256)
+            os.replace(partial_tarball, tarball)
+        tools.check_sha256(tarball, sha256)
+        return tarball
+
     def source(self):
-        tools.get(**self.conan_data["sources"][self.version])
+        source_data = self.conan_data["sources"][self.version]
+        # Sources may be fetched from a local mirror (file:// URL allowed, for offline builds),
+        # and shared between builds through a local cache
+        url = os.environ.get("OPENCASCADE_SOURCES_URL", source_data["url"])
+        cache_folder = os.environ.get("OPENCASCADE_SOURCES_CACHE")
+        if cache_folder or url.startswith("file://"):
+            tarball = self._get_sources_tarball(cache_folder or self.source_folder, url, source_data["sha256"])
+            tools.unzip(tarball)
+            if not cache_folder:
+                os.remove(tarball)
+        else:
+            tools.get(url, sha256=source_data["sha256"])
         extracted_dir = "OCCT-" + self.version.replace(".", "_")
         tools.rename(extracted_dir, self._source_subfolder)
 
-    def _patch_sources(self):
-        for patch in self.conan_data.get("patches", {}).get(self.version, []):
-            tools.patch(**patch)
+    def _get_source_replacements(self):
+        replacements = {}
+
+        def replace_in_file(file_path, search, replace):
+            replacements.setdefault(file_path, []).append((search, replace))
+
+        def append_to_file(file_path, content):
+            replacements.setdefault(file_path, []).append((None, content))
 
         cmakelists = os.path.join(self._source_subfolder, "CMakeLists.txt")
         cmakelists_tools = os.path.join(self._source_subfolder, "tools", "CMakeLists.txt")
@@ -106,101 +411,153 @@ class OpenCascadeConan(ConanFile):
 
         # Inject conanbuildinfo, upstream build files are not ready for a CMake wrapper (too much modifications required)
         # Also inject compile flags
-        tools.replace_in_file(
+        replace_in_file(
             cmakelists,
             "project (OCCT)",
             "project (OCCT)\n"
             "include(${CMAKE_BINARY_DIR}/conanbuildinfo.cmake)\n"
             "conan_basic_setup(TARGETS)\n"
-            "conan_global_flags()")
+            "conan_global_flags()\n"
+            "set(CMAKE_C_FLAGS \"${CMAKE_C_FLAGS} ${CONAN_OCCT_EXTRA_COMPILE_FLAGS}\")\n"
+            "set(CMAKE_CXX_FLAGS \"${CMAKE_CXX_FLAGS} ${CONAN_OCCT_EXTRA_COMPILE_FLAGS}\")\n"
+            "set(CMAKE_EXE_LINKER_FLAGS \"${CMAKE_EXE_LINKER_FLAGS} ${CONAN_OCCT_EXTRA_LINKER_FLAGS}\")\n"
+            "set(CMAKE_SHARED_LINKER_FLAGS \"${CMAKE_SHARED_LINKER_FLAGS} ${CONAN_OCCT_EXTRA_LINKER_FLAGS}\")\n"
+            "set(CMAKE_MODULE_LINKER_FLAGS \"${CMAKE_MODULE_LINKER_FLAGS} ${CONAN_OCCT_EXTRA_LINKER_FLAGS}\")\n"
+            "if (CONAN_OCCT_BUILD_PROFILE_LOG)\n"
+            "  set (CONAN_OCCT_BUILD_TIMER \"\\\"${CONAN_OCCT_PYTHON}\\\" \\\"${CONAN_OCCT_BUILD_TIMER_SCRIPT}\\\" \\\"${CONAN_OCCT_BUILD_PROFILE_LOG}\\\"\")\n"
+            "  set_property (GLOBAL PROPERTY RULE_LAUNCH_COMPILE \"${CONAN_OCCT_BUILD_TIMER} compile <TARGET_NAME> <OBJECT> --\")\n"
+            "  set_property (GLOBAL PROPERTY RULE_LAUNCH_LINK \"${CONAN_OCCT_BUILD_TIMER} link <TARGET_NAME> <TARGET> --\")\n"
+            "endif()")
+
+        # Allow to opt-out some toolkits from unity build
+        append_to_file(cmakelists, textwrap.dedent("""\
+
+            foreach (CONAN_OCCT_TOOLKIT ${CONAN_OCCT_NO_UNITY_BUILD_TOOLKITS})
+              if (TARGET ${CONAN_OCCT_TOOLKIT})
+                set_target_properties (${CONAN_OCCT_TOOLKIT} PROPERTIES UNITY_BUILD OFF)
+              endif()
+            endforeach()
+
+            foreach (CONAN_OCCT_TOOLKIT ${CONAN_OCCT_HEAVY_TOOLKITS})
+              if (TARGET ${CONAN_OCCT_TOOLKIT})
+                set_target_properties (${CONAN_OCCT_TOOLKIT} PROPERTIES JOB_POOL_COMPILE heavy_compile)
+              endif()
+            endforeach()
+
+            if (CONAN_OCCT_PGO_TRAINING_DIR)
+              add_subdirectory ("${CONAN_OCCT_PGO_TRAINING_DIR}" "${CMAKE_BINARY_DIR}/occt_pgo_training")
+            endif()
+        """))
 
         # Avoid to add system include/libs directories
-        tools.replace_in_file(cmakelists, "3RDPARTY_INCLUDE_DIRS", "CONAN_INCLUDE_DIRS")
-        tools.replace_in_file(cmakelists, "3RDPARTY_LIBRARY_DIRS", "CONAN_LIB_DIRS")
-        tools.replace_in_file(cmakelists_tools, "3RDPARTY_INCLUDE_DIRS", "CONAN_INCLUDE_DIRS")
-        tools.replace_in_file(cmakelists_tools, "3RDPARTY_LIBRARY_DIRS", "CONAN_LIB_DIRS")
+        replace_in_file(cmakelists, "3RDPARTY_INCLUDE_DIRS", "CONAN_INCLUDE_DIRS")
+        replace_in_file(cmakelists, "3RDPARTY_LIBRARY_DIRS", "CONAN_LIB_DIRS")
+        replace_in_file(cmakelists_tools, "3RDPARTY_INCLUDE_DIRS", "CONAN_INCLUDE_DIRS")
+        replace_in_file(cmakelists_tools, "3RDPARTY_LIBRARY_DIRS", "CONAN_LIB_DIRS")
 
         # Do not fail due to "fragile" upstream logic to find dependencies
-        tools.replace_in_file(cmakelists, "if (3RDPARTY_NOT_INCLUDED)", "if(0)")
-        tools.replace_in_file(cmakelists, "if (3RDPARTY_NO_LIBS)", "if(0)")
-        tools.replace_in_file(cmakelists, "if (3RDPARTY_NO_DLLS)", "if(0)")
+        replace_in_file(cmakelists, "if (3RDPARTY_NOT_INCLUDED)", "if(0)")
+        replace_in_file(cmakelists, "if (3RDPARTY_NO_LIBS)", "if(0)")
+        replace_in_file(cmakelists, "if (3RDPARTY_NO_DLLS)", "if(0)")
 
         # Inject dependencies from conan, and avoid to rely on upstream custom CMake files
         conan_targets = []
 
         ## freetype
-        conan_targets.append("CONAN_PKG::freetype")
-        tools.replace_in_file(cmakelists, "OCCT_INCLUDE_CMAKE_FILE (\"adm/cmake/freetype\")", "")
-        tools.replace_in_file(
-            occt_csf_cmake,
-            "set (CSF_FREETYPE \"freetype\")",
-            "set (CSF_FREETYPE \"{}\")".format(" ".join(self.deps_cpp_info["freetype"].libs)))
+        replace_in_file(cmakelists, "OCCT_INCLUDE_CMAKE_FILE (\"adm/cmake/freetype\")", "")
+        if self._link_visualization_deps:
+            conan_targets.append("CONAN_PKG::freetype")
+            replace_in_file(
+                occt_csf_cmake,
+                "set (CSF_FREETYPE \"freetype\")",
+                "set (CSF_FREETYPE \"{}\")".format(" ".join(self.deps_cpp_info["freetype"].libs)))
         ## tcl
-        conan_targets.append("CONAN_PKG::tcl")
-        tools.replace_in_file(cmakelists, "OCCT_INCLUDE_CMAKE_FILE (\"adm/cmake/tcl\")", "")
-        csf_tcl_libs = "set (CSF_TclLibs \"{}\")".format(" ".join(self.deps_cpp_info["tcl"].libs))
-        tools.replace_in_file(occt_csf_cmake, "set (CSF_TclLibs     \"tcl86\")", csf_tcl_libs)
-        tools.replace_in_file(occt_csf_cmake, "set (CSF_TclLibs   Tcl)", csf_tcl_libs)
-        tools.replace_in_file(occt_csf_cmake, "set (CSF_TclLibs     \"tcl8.6\")", csf_tcl_libs)
+        replace_in_file(cmakelists, "OCCT_INCLUDE_CMAKE_FILE (\"adm/cmake/tcl\")", "")
+        if self._link_tcl_tk:
+            conan_targets.append("CONAN_PKG::tcl")
+            csf_tcl_libs = "set (CSF_TclLibs \"{}\")".format(" ".join(self.deps_cpp_info["tcl"].libs))
+            replace_in_file(occt_csf_cmake, "set (CSF_TclLibs     \"tcl86\")", csf_tcl_libs)
+            replace_in_file(occt_csf_cmake, "set (CSF_TclLibs   Tcl)", csf_tcl_libs)
+            replace_in_file(occt_csf_cmake, "set (CSF_TclLibs     \"tcl8.6\")", csf_tcl_libs)
         ## tk
-        conan_targets.append("CONAN_PKG::tk")
-        tools.replace_in_file(cmakelists, "OCCT_INCLUDE_CMAKE_FILE (\"adm/cmake/tk\")", "")
-        csf_tk_libs = "set (CSF_TclTkLibs \"{}\")".format(" ".join(self.deps_cpp_info["tk"].libs))
-        tools.replace_in_file(occt_csf_cmake, "set (CSF_TclTkLibs   \"tk86\")", csf_tk_libs)
-        tools.replace_in_file(occt_csf_cmake, "set (CSF_TclTkLibs Tk)", csf_tk_libs)
-        tools.replace_in_file(occt_csf_cmake, "set (CSF_TclTkLibs   \"tk8.6\")", csf_tk_libs)
+        replace_in_file(cmakelists, "OCCT_INCLUDE_CMAKE_FILE (\"adm/cmake/tk\")", "")
+        if self._link_tcl_tk:
+            conan_targets.append("CONAN_PKG::tk")
+            csf_tk_libs = "set (CSF_TclTkLibs \"{}\")".format(" ".join(self.deps_cpp_info["tk"].libs))
+            replace_in_file(occt_csf_cmake, "set (CSF_TclTkLibs   \"tk86\")", csf_tk_libs)
+            replace_in_file(occt_csf_cmake, "set (CSF_TclTkLibs Tk)", csf_tk_libs)
+            replace_in_file(occt_csf_cmake, "set (CSF_TclTkLibs   \"tk8.6\")", csf_tk_libs)
         ## fontconfig
-        if self._is_linux:
+        if self._is_linux and self._link_visualization_deps:
             conan_targets.append("CONAN_PKG::fontconfig")
-            tools.replace_in_file(
+            replace_in_file(
                 occt_csf_cmake,
                 "set (CSF_fontconfig  \"fontconfig\")",
                 "set (CSF_fontconfig  \"{}\")".format(" ".join(self.deps_cpp_info["fontconfig"].libs)))
         ## tbb
         if self.options.with_tbb:
-            conan_targets.append("CONAN_PKG::tbb")
-            tools.replace_in_file(cmakelists, "OCCT_INCLUDE_CMAKE_FILE (\"adm/cmake/tbb\")", "")
-            tools.replace_in_file(
+            replace_in_file(cmakelists, "OCCT_INCLUDE_CMAKE_FILE (\"adm/cmake/tbb\")", "")
+            tbb_libs = self.deps_cpp_info["tbb"].libs
+            if self.options.allocator == "tbb":
+                conan_targets.append("CONAN_PKG::tbb")
+            else:
+                # Do not depend on tbbmalloc if TBB allocator is not selected: Standard_MMgrTBBalloc
+                # falls back to malloc when built without TBB.
+                # CONAN_PKG::tbb would link all TBB libs, so only core TBB lib is linked through CSF_TBB,
+                # include & lib dirs of TBB are already global (conan_global_flags)
+                tbb_libs = [lib for lib in tbb_libs if not lib.startswith("tbbmalloc")]
+                replace_in_file(
+                    os.path.join(self._source_subfolder, "src", "Standard", "Standard_MMgrTBBalloc.cxx"),
+                    "#ifdef HAVE_TBB",
+                    "#if 0")
+            replace_in_file(
                 occt_csf_cmake,
                 "set (CSF_TBB \"tbb tbbmalloc\")",
-                "set (CSF_TBB \"{}\")".format(" ".join(self.deps_cpp_info["tbb"].libs)))
+                "set (CSF_TBB \"{}\")".format(" ".join(tbb_libs)))
+            # OSD_Parallel uses TBB by default if available, it can be switched to OCCT threads at runtime
+            # with OSD_Parallel::SetUseOcctThreads(), here we change this default
+            if self.options.parallel_backend == "occt":
+                replace_in_file(
+                    os.path.join(self._source_subfolder, "src", "OSD", "OSD_Parallel.cxx"),
+                    "#ifdef HAVE_TBB\n  Standard_False;",
+                    "#ifdef HAVE_TBB\n  Standard_True;")
         ## ffmpeg
-        if self.options.with_ffmpeg:
+        if self.options.get_safe("with_ffmpeg"):
             conan_targets.append("CONAN_PKG::ffmpeg")
-            tools.replace_in_file(cmakelists, "OCCT_INCLUDE_CMAKE_FILE (\"adm/cmake/ffmpeg\")", "")
-            tools.replace_in_file(
+            replace_in_file(cmakelists, "OCCT_INCLUDE_CMAKE_FILE (\"adm/cmake/ffmpeg\")", "")
+            replace_in_file(
                 occt_csf_cmake,
                 "set (CSF_FFmpeg \"avcodec avformat swscale avutil\")",
                 "set (CSF_FFmpeg \"{}\")".format(" ".join(self.deps_cpp_info["ffmpeg"].libs)))
         ## freeimage
-        if self.options.with_freeimage:
+        if self.options.get_safe("with_freeimage"):
             conan_targets.append("CONAN_PKG::freeimage")
-            tools.replace_in_file(cmakelists, "OCCT_INCLUDE_CMAKE_FILE (\"adm/cmake/freeimage\")", "")
-            tools.replace_in_file(
+            replace_in_file(cmakelists, "OCCT_INCLUDE_CMAKE_FILE (\"adm/cmake/freeimage\")", "")
+            replace_in_file(
                 occt_csf_cmake,
                 "set (CSF_FreeImagePlus \"freeimage\")",
                 "set (CSF_FreeImagePlus \"{}\")".format(" ".join(self.deps_cpp_info["freeimage"].libs)))
         ## openvr
-        if self.options.with_openvr:
+        if self.options.get_safe("with_openvr"):
             conan_targets.append("CONAN_PKG::openvr")
-            tools.replace_in_file(cmakelists, "OCCT_INCLUDE_CMAKE_FILE (\"adm/cmake/openvr\")", "")
-            tools.replace_in_file(
+            replace_in_file(cmakelists, "OCCT_INCLUDE_CMAKE_FILE (\"adm/cmake/openvr\")", "")
+            replace_in_file(
                 occt_csf_cmake,
                 "set (CSF_OpenVR \"openvr_api\")",
                 "set (CSF_OpenVR \"{}\")".format(" ".join(self.deps_cpp_info["openvr"].libs)))
         ## rapidjson
-        if self.options.with_rapidjson:
+        if self.options.get_safe("with_rapidjson"):
             conan_targets.append("CONAN_PKG::rapidjson")
-            tools.replace_in_file(cmakelists, "OCCT_INCLUDE_CMAKE_FILE (\"adm/cmake/rapidjson\")", "")
+            replace_in_file(cmakelists, "OCCT_INCLUDE_CMAKE_FILE (\"adm/cmake/rapidjson\")", "")
 
         ## Inject conan targets
-        tools.replace_in_file(
+        replace_in_file(
             occt_toolkit_cmake,
             "${USED_EXTERNAL_LIBS_BY_CURRENT_PROJECT}",
             "${{USED_EXTERNAL_LIBS_BY_CURRENT_PROJECT}} {}".format(" ".join(conan_targets)))
 
         # Do not install pdb files
-        tools.replace_in_file(
+        replace_in_file(
             occt_toolkit_cmake,
             """    install (FILES  ${CMAKE_BINARY_DIR}/${OS_WITH_BIT}/${COMPILER}/bin\\${OCCT_INSTALL_BIN_LETTER}/${PROJECT_NAME}.pdb
              CONFIGURATIONS Debug RelWithDebInfo
@@ -208,41 +565,370 @@ class OpenCascadeConan(ConanFile):
             "")
 
         # Honor fPIC option, compiler.cppstd and compiler.libcxx
-        tools.replace_in_file(occt_defs_flags_cmake, "-fPIC", "")
-        tools.replace_in_file(occt_defs_flags_cmake, "-std=c++0x", "")
-        tools.replace_in_file(occt_defs_flags_cmake, "-std=gnu++0x", "")
-        tools.replace_in_file(occt_defs_flags_cmake, "-stdlib=libc++", "")
-        tools.replace_in_file(occt_csf_cmake,
-                              "set (CSF_ThreadLibs  \"pthread rt stdc++\")",
-                              "set (CSF_ThreadLibs  \"pthread rt\")")
+        replace_in_file(occt_defs_flags_cmake, "-fPIC", "")
+        replace_in_file(occt_defs_flags_cmake, "-std=c++0x", "")
+        replace_in_file(occt_defs_flags_cmake, "-std=gnu++0x", "")
+        replace_in_file(occt_defs_flags_cmake, "-stdlib=libc++", "")
+        replace_in_file(occt_csf_cmake,
+                        "set (CSF_ThreadLibs  \"pthread rt stdc++\")",
+                        "set (CSF_ThreadLibs  \"pthread rt\")")
 
         # No hardcoded link through #pragma
-        tools.replace_in_file(
+        replace_in_file(
             os.path.join(self._source_subfolder, "src", "Font", "Font_FontMgr.cxx"),
             "#pragma comment (lib, \"freetype.lib\")",
             "")
-        tools.replace_in_file(
+        replace_in_file(
             os.path.join(self._source_subfolder, "src", "Draw", "Draw.cxx"),
             """#pragma comment (lib, "tcl" STRINGIZE2(TCL_MAJOR_VERSION) STRINGIZE2(TCL_MINOR_VERSION) ".lib")
 #pragma comment (lib, "tk"  STRINGIZE2(TCL_MAJOR_VERSION) STRINGIZE2(TCL_MINOR_VERSION) ".lib")""",
             ""
         )
 
-    def _configure_cmake(self):
+        return replacements
+
+    @property
+    def _patches_stamp_file(self):
+        return os.path.join(self.build_folder, self._source_subfolder, ".conan_patches_stamp")
+
+    def _get_patches_digest(self, patches, replacements):
+        patches_content = [tools.load(patch["patch_file"]) for patch in patches]
+        return hashlib.sha256(json.dumps({
+            "patches": [patches, patches_content],
+            "replacements": sorted(replacements.items()),
+        }).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _apply_replacements(file_path, replacements):
+        content = tools.load(file_path)
+        patched_content = content
+        for search, replace in replacements:
+            if search is None:
+                patched_content += replace
+            elif search in patched_content:
+                patched_content = patched_content.replace(search, replace)
+            else:
+                raise ConanException("replace_in_file didn't find pattern '{}' in '{}' file.".format(search, file_path))
+        # Do not touch files which are not modified, to not trigger their rebuild
+        if patched_content != content:
+            tools.save(file_path, patched_content)
+
+    def _patch_sources(self):
+        patches = self.conan_data.get("patches", {}).get(self.version, [])
+        replacements = self._get_source_replacements()
+        patches_digest = self._get_patches_digest(patches, replacements)
+
+        # Sources are patched only once in a given build folder, so that build() can be called again
+        # to rebuild incrementally
+        if os.path.isfile(self._patches_stamp_file):
+            if tools.load(self._patches_stamp_file) == patches_digest:
+                self.output.info("Sources already patched, skipping patches")
+                return
+            raise ConanException("Sources have been patched with a different recipe or configuration, "
+                                 "please clean build folder {}".format(self.build_folder))
+
+        for patch in patches:
+            tools.patch(**patch)
+        # All substitutions of a file are applied in memory, then the file is written once
+        for file_path, file_replacements in replacements.items():
+            self._apply_replacements(file_path, file_replacements)
+        tools.save(self._patches_stamp_file, patches_digest)
+
+    @property
+    def _pgo_profiles_folder(self):
+        return os.path.join(self.build_folder, "pgo_profiles")
+
+    @property
+    def _pgo_training_data_folder(self):
+        return os.path.join(self.build_folder, "pgo_training_data")
+
+    @property
+    def _pgo_merged_profile(self):
+        return os.path.join(self._pgo_profiles_folder, "occt.profdata")
+
+    def _get_pgo_flags(self, pgo_instrumented):
+        # Returns compile flags and link flags of PGO instrumented or optimized build
+        if not self.options.pgo:
+            return [], []
+        if self.settings.compiler == "gcc":
+            if pgo_instrumented:
+                flags = ["-fprofile-generate={}".format(self._pgo_profiles_folder), "-fprofile-update=atomic"]
+                return flags, flags
+            return ["-fprofile-use={}".format(self._pgo_profiles_folder), "-fprofile-correction", "-Wno-missing-profile"], []
+        if pgo_instrumented:
+            return ["-fprofile-instr-generate"], ["-fprofile-instr-generate"]
+        return ["-fprofile-instr-use={}".format(self._pgo_merged_profile), "-Wno-profile-instr-unprofiled",
+                "-Wno-profile-instr-out-of-date"], []
+
+    def _resolve_compiler_cache(self):
+        # Compiler cache is not part of package id, so it's selected through environment.
+        # Resolved once: (name, path), or (None, None) without compiler cache
+        if self._compiler_cache_resolved is None:
+            self._compiler_cache_resolved = (None, None)
+            compiler_cache = os.environ.get("OPENCASCADE_COMPILER_CACHE")
+            if compiler_cache:
+                if compiler_cache not in ["ccache", "sccache"]:
+                    raise ConanException("OPENCASCADE_COMPILER_CACHE must be ccache or sccache, not {}".format(compiler_cache))
+                compiler_cache_path = tools.which(compiler_cache)
+                if compiler_cache_path:
+                    self._compiler_cache_resolved = (compiler_cache, compiler_cache_path)
+                else:
+                    self.output.warn("{} not found, building without compiler cache".format(compiler_cache))
+        return self._compiler_cache_resolved
+
+    @property
+    def _compiler_cache(self):
+        return self._resolve_compiler_cache()[0]
+
+    @property
+    def _compiler_cache_path(self):
+        return self._resolve_compiler_cache()[1]
+
+    @property
+    def _compiler_cache_partition(self):
+        # One cache per profile, so that profiles don't evict each other's objects
+        settings = [str(self.settings.get_safe(setting)) for setting in
+                    ["os", "arch", "compiler", "compiler.version", "compiler.libcxx", "compiler.runtime", "build_type"]]
+        return "-".join(settings[:3] + [hashlib.sha256("|".join(settings).encode("utf-8")).hexdigest()[:12]])
+
+    @property
+    def _compiler_cache_env(self):
+        compiler_cache = self._compiler_cache
+        if not compiler_cache:
+            return {}
+        cache_root = os.environ.get("OPENCASCADE_COMPILER_CACHE_DIR")
+        cache_dir = os.path.join(cache_root, self._compiler_cache_partition) if cache_root else None
+        cache_size = os.environ.get("OPENCASCADE_COMPILER_CACHE_SIZE")
+        env = {}
+        if compiler_cache == "ccache":
+            # Build folder path is remapped (see _get_extra_flags), so that objects are shared between build folders
+            env["CCACHE_BASEDIR"] = self.build_folder
+            env["CCACHE_NOHASHDIR"] = "true"
+            env["CCACHE_COMPILERCHECK"] = "content"
+            if self.options.use_pch:
+                env["CCACHE_SLOPPINESS"] = "pch_defines,time_macros,include_file_mtime,include_file_ctime"
+            if cache_dir:
+                env["CCACHE_DIR"] = cache_dir
+            if cache_size:
+                env["CCACHE_MAXSIZE"] = cache_size
+        else:
+            if cache_dir:
+                env["SCCACHE_DIR"] = cache_dir
+            if cache_size:
+                env["SCCACHE_CACHE_SIZE"] = cache_size
+        return env
+
+    def _run_compiler_cache(self, args, ignore_errors=False):
+        if self._compiler_cache:
+            self.run("\"{}\" {}".format(self._compiler_cache_path, args), ignore_errors=ignore_errors)
+
+    def _get_available_memory_gb(self):
+        memory_gb = os.environ.get("OPENCASCADE_BUILD_MEMORY_GB")
+        if memory_gb:
+            return float(memory_gb)
+        memory_bytes = None
+        if tools.os_info.is_linux:
+            with open("/proc/meminfo") as meminfo:
+                for line in meminfo:
+                    if line.startswith("MemAvailable:"):
+                        memory_bytes = int(line.split()[1]) * 1024
+            # Containers may be limited by cgroups
+            for cgroup_limit_file in ["/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"]:
+                if os.path.isfile(cgroup_limit_file):
+                    cgroup_limit = tools.load(cgroup_limit_file).strip()
+                    if cgroup_limit.isdigit():
+                        memory_bytes = min(memory_bytes, int(cgroup_limit)) if memory_bytes else int(cgroup_limit)
+        elif tools.os_info.is_macos:
+            output = StringIO()
+            self.run("sysctl -n hw.memsize", output=output)
+            memory_bytes = int(output.getvalue().strip())
+        elif tools.os_info.is_windows:
+            import ctypes
+
+            class MemoryStatusEx(ctypes.Structure):
+                _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                            ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                            ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                            ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                            ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+
+            memory_status = MemoryStatusEx()
+            memory_status.dwLength = ctypes.sizeof(MemoryStatusEx)
+            ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(memory_status))
+            memory_bytes = memory_status.ullAvailPhys
+        if not memory_bytes:
+            raise ConanException("Can't detect available memory, please set OPENCASCADE_BUILD_MEMORY_GB")
+        return memory_bytes / float(1024 ** 3)
+
+    def _get_job_pools(self):
+        # Heavy compile & link pools get a share of memory according to their peak memory per job (GB).
+        # Regular compile pool uses what is left when heavy & link pools are all busy, so that it never
+        # exceeds available memory, and can use all cores when memory allows it
+        memory_gb = self._get_available_memory_gb()
+        cpu_count = tools.cpu_count()
+        reserved_pools = {
+            "heavy_compile": (0.25, 2.5),
+            "link": (0.15, 4.0 if self.options.lto else 2.0),
+        }
+        job_pools = {name: max(1, min(cpu_count, int(memory_gb * share / job_memory)))
+                     for name, (share, job_memory) in reserved_pools.items()}
+        reserved_memory_gb = sum(job_pools[name] * job_memory for name, (_, job_memory) in reserved_pools.items())
+        # Estimated peak memory of a regular OCCT translation unit, may be overridden for a given machine
+        compile_job_memory = float(os.environ.get("OPENCASCADE_BUILD_COMPILE_JOB_GB", "0.5"))
+        job_pools["compile"] = max(1, min(cpu_count, int((memory_gb - reserved_memory_gb) / compile_job_memory)))
+        self.output.info("Available memory: {:.1f} GB, job pools: {}".format(
+                         memory_gb, ", ".join("{}={}".format(name, size) for name, size in job_pools.items())))
+        return job_pools
+
+    @property
+    def _gc_sections_compile_flags(self):
+        if self.settings.compiler == "Visual Studio":
+            return ["/Gy", "/Gw"]
+        return ["-ffunction-sections", "-fdata-sections"]
+
+    @property
+    def _gc_sections_link_flags(self):
+        if self.settings.compiler == "Visual Studio":
+            return ["/OPT:REF", "/OPT:ICF"]
+        if tools.is_apple_os(self.settings.os):
+            return ["-Wl,-dead_strip"]
+        return ["-Wl,--gc-sections"]
+
+    @property
+    def _cpu_target_flags(self):
+        cpu_target = str(self.options.get_safe("cpu_target", "x86-64"))
+        if cpu_target == "x86-64":
+            return []
+        if self.settings.compiler == "Visual Studio":
+            # No /arch value between SSE2 and AVX, x86-64-v2 keeps default code generation
+            return {"x86-64-v2": [], "x86-64-v3": ["/arch:AVX2"], "x86-64-v4": ["/arch:AVX512"]}[cpu_target]
+        compiler_version = tools.Version(self.settings.compiler.version)
+        if (self.settings.compiler == "gcc" and compiler_version >= "11") or \
+           (self.settings.compiler == "clang" and compiler_version >= "12"):
+            return ["-march={}".format(cpu_target)]
+        # Older compilers don't know microarchitecture levels, features are enabled one by one
+        features = {
+            "x86-64-v2": ["cx16", "sahf", "popcnt", "sse3", "sse4.1", "sse4.2", "ssse3"],
+            "x86-64-v3": ["avx", "avx2", "bmi", "bmi2", "f16c", "fma", "lzcnt", "movbe", "xsave"],
+            "x86-64-v4": ["avx512f", "avx512bw", "avx512cd", "avx512dq", "avx512vl"],
+        }
+        levels = ["x86-64-v2", "x86-64-v3", "x86-64-v4"]
+        return ["-m{}".format(feature) for level in levels[:levels.index(cpu_target) + 1] for feature in features[level]]
+
+    def _get_extra_flags(self, pgo_instrumented=False):
+        compile_flags, link_flags = self._get_pgo_flags(pgo_instrumented)
+        # Default memory allocator if MMGT_OPT is not set at runtime
+        compile_flags.append("-DOCCT_MMGT_OPT_DEFAULT={}".format(self._mmgt_opt))
+        # Instruction set level, binaries don't run on CPUs older than this level
+        compile_flags.extend(self._cpu_target_flags)
+        # Allow consumers (and OCCT shared libs) to discard unused functions & data at link time
+        if self.options.gc_sections:
+            compile_flags.extend(self._gc_sections_compile_flags)
+            link_flags.extend(self._gc_sections_link_flags)
+        # Less exported symbols & relocations to process by dynamic loader
+        if self.options.get_safe("optimize_dynamic_loading"):
+            compile_flags.append("-fvisibility-inlines-hidden")
+            if not tools.is_apple_os(self.settings.os):
+                link_flags.extend(["-Wl,-Bsymbolic-functions", "-Wl,--hash-style=gnu", "-Wl,-O1"])
+        # Per translation unit breakdown of compile time, written next to each object file
+        if self.options.build_profile and self._has_time_trace and not pgo_instrumented:
+            compile_flags.append("-ftime-trace")
+        # Debug info out of objects (.dwo files) is not processed by linker
+        if self.options.get_safe("split_dwarf"):
+            compile_flags.append("-gsplit-dwarf")
+        if self.options.get_safe("compress_debug_sections"):
+            compile_flags.append("-gz")
+            link_flags.append("-Wl,--compress-debug-sections=zlib")
+        # Separated debug info files are looked up by build id
+        if self.options.get_safe("separate_debug_info"):
+            link_flags.append("-Wl,--build-id")
+        # Remove build folder from __FILE__ & debug info, so that compiler cache hits across build folders.
+        # Not with split DWARF: dwp must find .dwo files from compilation directory stored in binaries
+        if self._compiler_cache and not self.options.get_safe("split_dwarf") and self.settings.compiler in ["gcc", "clang", "apple-clang"]:
+            compiler_version = tools.Version(self.settings.compiler.version)
+            if (self.settings.compiler == "gcc" and compiler_version >= "8") or \
+               (self.settings.compiler == "clang" and compiler_version >= "10") or \
+               (self.settings.compiler == "apple-clang" and compiler_version >= "12"):
+                compile_flags.append("-ffile-prefix-map={}=.".format(self.build_folder))
+            else:
+                compile_flags.append("-fdebug-prefix-map={}=.".format(self.build_folder))
+        return compile_flags, link_flags
+
+    @property
+    def _has_time_trace(self):
+        return self.settings.compiler == "clang" and tools.Version(self.settings.compiler.version) >= "9"
+
+    @property
+    def _build_profile_folder(self):
+        return os.path.join(self.build_folder, "build_profile")
+
+    @property
+    def _build_profile_log(self):
+        return os.path.join(self._build_profile_folder, "timings.jsonl")
+
+    @property
+    def _python_interpreter(self):
+        # sys.executable is conan binary itself in frozen conan installers (Windows installer, .deb, .pkg)
+        if not getattr(sys, "frozen", False):
+            return sys.executable
+        python = tools.which("python3") or tools.which("python")
+        if not python:
+            raise ConanException("build_profile option requires a python interpreter in PATH to run build timer script")
+        return python
+
+    def _configure_cmake(self, pgo_instrumented=False):
         if self._cmake:
             return self._cmake
-        self._cmake = CMake(self)
+        self._cmake = CMake(self, generator="Ninja" if self._use_ninja else None)
+
+        if self.options.memory_aware_build:
+            job_pools = self._get_job_pools()
+            self._cmake.definitions["CMAKE_JOB_POOLS"] = ";".join("{}={}".format(name, size) for name, size in job_pools.items())
+            self._cmake.definitions["CMAKE_JOB_POOL_COMPILE"] = "compile"
+            self._cmake.definitions["CMAKE_JOB_POOL_LINK"] = "link"
+            self._cmake.definitions["CONAN_OCCT_HEAVY_TOOLKITS"] = ";".join(self._heavy_toolkits)
+
+        extra_compile_flags, extra_link_flags = self._get_extra_flags(pgo_instrumented)
+        self._cmake.definitions["CONAN_OCCT_EXTRA_COMPILE_FLAGS"] = " ".join(extra_compile_flags)
+        self._cmake.definitions["CONAN_OCCT_EXTRA_LINKER_FLAGS"] = " ".join(extra_link_flags)
+        if self._compiler_cache:
+            compiler_cache_path = self._compiler_cache_path.replace("\\", "/")
+            self._cmake.definitions["CMAKE_C_COMPILER_LAUNCHER"] = compiler_cache_path
+            self._cmake.definitions["CMAKE_CXX_COMPILER_LAUNCHER"] = compiler_cache_path
+        # Each compile & link command of final build is wrapped by a timer script (RULE_LAUNCH_COMPILE/LINK).
+        # Always defined, so that a value cached by a previous configuration doesn't profile PGO instrumented build
+        build_profile_log = ""
+        if self.options.build_profile and not pgo_instrumented:
+            build_profile_log = self._build_profile_log.replace("\\", "/")
+            self._cmake.definitions["CONAN_OCCT_PYTHON"] = self._python_interpreter.replace("\\", "/")
+            self._cmake.definitions["CONAN_OCCT_BUILD_TIMER_SCRIPT"] = os.path.join(self.build_folder, "scripts", "occt_build_timer.py").replace("\\", "/")
+        self._cmake.definitions["CONAN_OCCT_BUILD_PROFILE_LOG"] = build_profile_log
+        pgo_training_dir = os.path.join(self.build_folder, "pgo").replace("\\", "/") if pgo_instrumented else ""
+        self._cmake.definitions["CONAN_OCCT_PGO_TRAINING_DIR"] = pgo_training_dir
+        if pgo_instrumented:
+            self._cmake.definitions["CONAN_OCCT_PGO_TRAINING_DATA_DIR"] = self._pgo_training_data_folder.replace("\\", "/")
+            self._cmake.definitions["CONAN_OCCT_PGO_RAW_PROFILE"] = os.path.join(self._pgo_profiles_folder, "occt-%p.profraw").replace("\\", "/")
 
         # Inject C++ standard from profile since we have removed hardcoded C++11 from upstream build files
         self._cmake.definitions["CMAKE_CXX_STANDARD"] = self.settings.compiler.get_safe("cppstd", "11")
 
         self._cmake.definitions["BUILD_LIBRARY_TYPE"] = "Shared" if self.options.shared else "Static"
         self._cmake.definitions["INSTALL_TEST_CASES"] = False
-        self._cmake.definitions["BUILD_RESOURCES"] = False
         self._cmake.definitions["BUILD_RELEASE_DISABLE_EXCEPTIONS"] = True
         if self.settings.build_type == "Debug":
             self._cmake.definitions["BUILD_WITH_DEBUG"] = self.options.extended_debug_messages
-        self._cmake.definitions["BUILD_USE_PCH"] = False
+        if self.options.lto:
+            # Upstream CMakeLists has a too low cmake_minimum_required() to enable IPO without CMP0069.
+            # CMake uses thin LTO for clang >= 3.9 & apple-clang >= 8
+            self._cmake.definitions["CMAKE_POLICY_DEFAULT_CMP0069"] = "NEW"
+            self._cmake.definitions["CMAKE_INTERPROCEDURAL_OPTIMIZATION"] = True
+        if self.options.use_pch or self.options.unity_build:
+            self.output.warn("use_pch and unity_build options are experimental, please report toolkits failing to build")
+        self._cmake.definitions["BUILD_USE_PCH"] = self.options.use_pch
+        if self.options.unity_build:
+            self._cmake.definitions["CMAKE_UNITY_BUILD"] = True
+            self._cmake.definitions["CMAKE_UNITY_BUILD_BATCH_SIZE"] = self.options.unity_build_batch_size
+            self._cmake.definitions["CONAN_OCCT_NO_UNITY_BUILD_TOOLKITS"] = ";".join(self._no_unity_build_toolkits)
         self._cmake.definitions["INSTALL_SAMPLES"] = False
 
         self._cmake.definitions["INSTALL_DIR_LAYOUT"] = "Unix"
@@ -265,19 +951,159 @@ class OpenCascadeConan(ConanFile):
         self._cmake.definitions["BUILD_ENABLE_FPE_SIGNAL_HANDLER"] = False
         self._cmake.definitions["BUILD_DOC_Overview"] = False
 
-        self._cmake.definitions["USE_FREEIMAGE"] = self.options.with_freeimage
-        self._cmake.definitions["USE_OPENVR"] = self.options.with_openvr
-        self._cmake.definitions["USE_FFMPEG"] = self.options.with_ffmpeg
+        self._cmake.definitions["USE_FREEIMAGE"] = bool(self.options.get_safe("with_freeimage"))
+        self._cmake.definitions["USE_OPENVR"] = bool(self.options.get_safe("with_openvr"))
+        self._cmake.definitions["USE_FFMPEG"] = bool(self.options.get_safe("with_ffmpeg"))
         self._cmake.definitions["USE_TBB"] = self.options.with_tbb
-        self._cmake.definitions["USE_RAPIDJSON"] = self.options.with_rapidjson
+        self._cmake.definitions["USE_RAPIDJSON"] = bool(self.options.get_safe("with_rapidjson"))
+
+        # Build selected modules only, toolkits of other modules required by them are built as additional toolkits
+        for module in self._modules_dependencies.keys():
+            self._cmake.definitions["BUILD_MODULE_{}".format(module)] = module in self._enabled_modules
+        self._cmake.definitions["BUILD_ADDITIONAL_TOOLKITS"] = ";".join(self._get_additional_toolkits())
 
         self._cmake.configure(source_folder=self._source_subfolder)
         return self._cmake
 
+    def _get_additional_toolkits(self):
+        occt_graph = self._parse_occt_graph()
+        toolkit_to_module = {toolkit: module for module, toolkits in occt_graph.items() for toolkit in toolkits}
+        toolkits_deps = {toolkit: deps for toolkits in occt_graph.values() for toolkit, deps in toolkits.items()}
+
+        # Walk through EXTERNLIB dependencies of toolkits of enabled modules
+        required_toolkits = set()
+        toolkits_to_visit = [toolkit for module in self._enabled_modules for toolkit in occt_graph.get(module, {})]
+        while toolkits_to_visit:
+            toolkit = toolkits_to_visit.pop()
+            if toolkit in required_toolkits:
+                continue
+            required_toolkits.add(toolkit)
+            toolkits_to_visit.extend(dep for dep in toolkits_deps[toolkit] if dep in toolkits_deps)
+
+        # Hardcoded modules dependencies must be consistent with the ones found in source code
+        for toolkit in required_toolkits:
+            if toolkit_to_module[toolkit] not in self._required_modules:
+                raise ConanException("{} is required by enabled modules, but its module {} has not been "
+                                     "taken into account in requirements()".format(toolkit, toolkit_to_module[toolkit]))
+            for dependency in toolkits_deps[toolkit]:
+                conan_requirement = self._csf_to_conan_requirement.get(dependency)
+                if conan_requirement and conan_requirement not in self.deps_cpp_info.deps:
+                    raise ConanException("{} of {} requires {}, which is not a requirement of {}".format(
+                                         dependency, toolkit, conan_requirement, self.name))
+
+        return sorted(toolkit for toolkit in required_toolkits
+                      if toolkit_to_module[toolkit] not in self._enabled_modules)
+
+    def _build_pgo_profile(self):
+        # Instrumented build, then training workload to generate profile consumed by optimized build
+        tools.rmdir(self._pgo_profiles_folder)
+        tools.mkdir(self._pgo_profiles_folder)
+        tools.rmdir(self._pgo_training_data_folder)
+        tools.mkdir(self._pgo_training_data_folder)
+        cmake = self._configure_cmake(pgo_instrumented=True)
+        cmake.build()
+        # Builds & runs training executable, its location is only known by CMake (see pgo/CMakeLists.txt)
+        with tools.run_environment(self):
+            cmake.build(target="occt_pgo_training_run")
+
+        if self.settings.compiler in ["clang", "apple-clang"]:
+            llvm_profdata = "xcrun llvm-profdata" if self.settings.compiler == "apple-clang" else "llvm-profdata"
+            raw_profiles = [os.path.join(self._pgo_profiles_folder, f) for f in os.listdir(self._pgo_profiles_folder) if f.endswith(".profraw")]
+            self.run("{} merge -output={} {}".format(llvm_profdata, self._pgo_merged_profile, " ".join(raw_profiles)))
+
+        # Optimized build is configured in the same build tree, so that gcc finds profile of each object file
+        self._cmake = None
+
     def build(self):
         self._patch_sources()
-        cmake = self._configure_cmake()
-        cmake.build()
+        with tools.environment_append(self._compiler_cache_env):
+            if self._compiler_cache == "sccache":
+                # sccache server must be restarted to take into account cache location
+                self._run_compiler_cache("--stop-server", ignore_errors=True)
+            # Statistics are those of the whole cache partition: builds running concurrently with the same
+            # profile (e.g. build_matrix.py jobs) share it, so they zero & count each other's hits and misses
+            self._run_compiler_cache("--zero-stats")
+            if self.options.pgo:
+                self._build_pgo_profile()
+            cmake = self._configure_cmake()
+            if self.options.build_profile:
+                # Only steps of final build are profiled, PGO instrumented build is configured without timer
+                tools.rmdir(self._build_profile_folder)
+                tools.mkdir(self._build_profile_folder)
+            cmake.build()
+            self._run_compiler_cache("--show-stats")
+        if self.options.build_profile:
+            self._create_build_profile_report()
+
+    @staticmethod
+    def _get_time_trace_durations(object_file):
+        # clang -ftime-trace writes foo.cxx.json next to foo.cxx.o, durations are in microseconds
+        trace_file = os.path.splitext(object_file)[0] + ".json"
+        if not os.path.isfile(trace_file):
+            return None
+        durations = {"frontend_time_s": 0.0, "backend_time_s": 0.0}
+        for event in json.loads(tools.load(trace_file)).get("traceEvents", []):
+            if event.get("name") == "Total Frontend":
+                durations["frontend_time_s"] += event.get("dur", 0) / 1e6
+            elif event.get("name") == "Total Backend":
+                durations["backend_time_s"] += event.get("dur", 0) / 1e6
+        return durations
+
+    def _create_build_profile_report(self):
+        if not os.path.isfile(self._build_profile_log):
+            self.output.warn("No build step recorded, build_profile is only supported by Makefile & Ninja generators")
+            return
+        toolkit_to_module = {toolkit: module for module, toolkits in self._parse_occt_graph().items() for toolkit in toolkits}
+
+        toolkits = {}
+        for line in tools.load(self._build_profile_log).splitlines():
+            step = json.loads(line)
+            toolkit = toolkits.setdefault(step["target"], {
+                "module": toolkit_to_module.get(step["target"], ""),
+                "translation_units": 0,
+                "compile_time_s": 0.0,
+                "max_translation_unit_time_s": 0.0,
+                "link_time_s": 0.0,
+                "frontend_time_s": 0.0,
+                "backend_time_s": 0.0,
+            })
+            if step["step"] == "link":
+                toolkit["link_time_s"] += step["wall_time_s"]
+                continue
+            toolkit["translation_units"] += 1
+            toolkit["compile_time_s"] += step["wall_time_s"]
+            toolkit["max_translation_unit_time_s"] = max(toolkit["max_translation_unit_time_s"], step["wall_time_s"])
+            time_trace_durations = self._get_time_trace_durations(step["output"]) if self._has_time_trace else None
+            for name, duration in (time_trace_durations or {}).items():
+                toolkit[name] += duration
+
+        modules = {}
+        for toolkit_name, toolkit in toolkits.items():
+            module = modules.setdefault(toolkit["module"], {"toolkits": [], "compile_time_s": 0.0, "link_time_s": 0.0})
+            module["toolkits"].append(toolkit_name)
+            module["compile_time_s"] += toolkit["compile_time_s"]
+            module["link_time_s"] += toolkit["link_time_s"]
+
+        # Wall times are summed over parallel jobs, they are CPU-bound build costs, not elapsed build time
+        report = {
+            "generator": self._cmake.generator,
+            "time_trace": self._has_time_trace,
+            "modules": modules,
+            "toolkits": toolkits,
+        }
+        tools.save(os.path.join(self._build_profile_folder, "occt_build_profile.json"), json.dumps(report, indent=4))
+
+        fields = ["module", "toolkit", "translation_units", "compile_time_s", "max_translation_unit_time_s",
+                  "link_time_s", "frontend_time_s", "backend_time_s"]
+        with open(os.path.join(self._build_profile_folder, "occt_build_profile.csv"), "w") as csv_file:
+            writer = csv.DictWriter(csv_file, fieldnames=fields, lineterminator="\n")
+            writer.writeheader()
+            for toolkit_name, toolkit in sorted(toolkits.items(), key=lambda item: -item[1]["compile_time_s"] - item[1]["link_time_s"]):
+                writer.writerow(dict(toolkit, toolkit=toolkit_name))
+
+        slowest = sorted(toolkits, key=lambda name: -toolkits[name]["compile_time_s"])[:5]
+        self.output.info("Slowest toolkits to compile: {}".format(", ".join(
+                         "{} ({:.0f}s)".format(name, toolkits[name]["compile_time_s"]) for name in slowest)))
 
     def _replace_package_folder(self, source, target):
         new_name = ""
@@ -306,26 +1132,120 @@ class OpenCascadeConan(ConanFile):
         elif self.settings.build_type == "RelWithDebInfo":
             self._replace_package_folder("libi", "lib")
             self._replace_package_folder("bini", "bin")
+        # Libraries fall back to their compiled-in copy of these resources, resource files are not packaged
+        # and their environment variables are not set (see package_info())
+        if self.options.embed_resources:
+            for resource in self._embedded_resources:
+                tools.rmdir(os.path.join(self.package_folder, self._resources_folder, resource))
+
+        self._check_no_tbbmalloc_dependency()
+        if self.options.get_safe("split_dwarf"):
+            self._package_dwp_files()
+        if self.options.get_safe("separate_debug_info"):
+            self._separate_debug_info()
+        if self.options.build_profile:
+            self.copy("occt_build_profile.*", src=self._build_profile_folder, dst="lib")
 
         occt_modules = self._get_modules_from_source_code()
-        self._create_modules_json_file(occt_modules)
+        self._save_modules_manifest(self._modules_helper_filepath, occt_modules)
 
         self._create_cmake_module_alias_targets(
             os.path.join(self.package_folder, self._cmake_module_file_rel_path),
             {target: "OpenCASCADE::{}".format(target) for module in occt_modules.values() for target in module}
         )
 
+    def _check_no_tbbmalloc_dependency(self):
+        # Shared libs must be loadable without TBB allocator runtime if it's not the selected allocator
+        if not self.options.shared or self.options.allocator == "tbb":
+            return
+        if self._is_linux:
+            inspect_tool, inspect_command = "readelf", "readelf -d"
+        elif tools.is_apple_os(self.settings.os):
+            inspect_tool, inspect_command = "otool", "otool -L"
+        else:
+            return
+        if not tools.which(inspect_tool):
+            self.output.warn("{} not found, can't check dependencies on TBB allocator".format(inspect_tool))
+            return
+        lib_folder = os.path.join(self.package_folder, "lib")
+        for lib_file in os.listdir(lib_folder):
+            if not lib_file.endswith((".so", ".dylib")):
+                continue
+            output = StringIO()
+            self.run("{} {}".format(inspect_command, os.path.join(lib_folder, lib_file)), output=output)
+            if "tbbmalloc" in output.getvalue():
+                raise ConanException("{} depends on TBB allocator, while allocator={}".format(lib_file, self.options.allocator))
+
+    @property
+    def _debug_folder(self):
+        return "debug"
+
+    def _get_elf_binaries(self):
+        binaries = []
+        for folder in ["lib", "bin"]:
+            folder_path = os.path.join(self.package_folder, folder)
+            if not os.path.isdir(folder_path):
+                continue
+            for file_name in sorted(os.listdir(folder_path)):
+                file_path = os.path.join(folder_path, file_name)
+                if os.path.islink(file_path) or not os.path.isfile(file_path):
+                    continue
+                with open(file_path, "rb") as binary:
+                    if binary.read(4) == b"\x7fELF":
+                        binaries.append(file_path)
+        return binaries
+
+    def _find_binutils_tool(self, *candidates):
+        for candidate in candidates:
+            if tools.which(candidate):
+                return candidate
+        raise ConanException("None of {} found, required to package debug info".format(", ".join(candidates)))
+
+    def _package_dwp_files(self):
+        # Gather .dwo files of each binary in a .dwp file, next to the binary or in debug folder.
+        # dwp looks for .dwo files in build folder, so it must run before build folder is removed
+        dwp = self._find_binutils_tool("llvm-dwp", "dwp") if self.settings.compiler == "clang" else \
+              self._find_binutils_tool("dwp", "llvm-dwp")
+        for binary in self._get_elf_binaries():
+            if self.options.separate_debug_info:
+                dwp_file = os.path.join(self.package_folder, self._debug_folder, os.path.basename(binary) + ".dwp")
+                tools.mkdir(os.path.dirname(dwp_file))
+            else:
+                dwp_file = binary + ".dwp"
+            with tools.chdir(self.build_folder):
+                self.run("{} -e {} -o {}".format(dwp, binary, dwp_file))
+
+    def _get_build_id(self, binary):
+        output = StringIO()
+        self.run("readelf -n {}".format(binary), output=output)
+        for line in output.getvalue().splitlines():
+            if "Build ID:" in line:
+                return line.split("Build ID:")[1].strip()
+        raise ConanException("{} has no build id, its debug info can't be separated".format(binary))
+
+    def _separate_debug_info(self):
+        # Debug info is moved to debug/.build-id/xx/yyyy.debug (layout of debug-file-directory of gdb & lldb),
+        # so that consumers which don't debug OCCT can drop debug folder
+        objcopy = self._find_binutils_tool("objcopy", "llvm-objcopy")
+        self._find_binutils_tool("readelf")
+        for binary in self._get_elf_binaries():
+            build_id = self._get_build_id(binary)
+            debug_file = os.path.join(self.package_folder, self._debug_folder, ".build-id",
+                                      build_id[:2], build_id[2:] + ".debug")
+            tools.mkdir(os.path.dirname(debug_file))
+            compress = " --compress-debug-sections=zlib" if self.options.compress_debug_sections else ""
+            self.run("{} --only-keep-debug{} {} {}".format(objcopy, compress, binary, debug_file))
+            self.run("{} --strip-debug --add-gnu-debuglink={} {}".format(objcopy, debug_file, binary))
+
     @staticmethod
     def _create_cmake_module_alias_targets(module_file, targets):
-        content = ""
-        for alias, aliased in targets.items():
-            content += textwrap.dedent("""\
-                if(TARGET {aliased} AND NOT TARGET {alias})
-                    add_library({alias} INTERFACE IMPORTED)
-                    set_property(TARGET {alias} PROPERTY INTERFACE_LINK_LIBRARIES {aliased})
-                endif()
-            """.format(alias=alias, aliased=aliased))
-        tools.save(module_file, content)
+        template = textwrap.dedent("""\
+            if(TARGET {aliased} AND NOT TARGET {alias})
+                add_library({alias} INTERFACE IMPORTED)
+                set_property(TARGET {alias} PROPERTY INTERFACE_LINK_LIBRARIES {aliased})
+            endif()
+        """)
+        tools.save(module_file, "".join(template.format(alias=alias, aliased=aliased) for alias, aliased in targets.items()))
 
     @property
     def _cmake_module_subfolder(self):
@@ -338,19 +1258,20 @@ class OpenCascadeConan(ConanFile):
 
     def _get_modules_from_source_code(self):
         csf_to_conan_dependencies = {
-            # Mandatory dependencies
-            "CSF_FREETYPE": {"externals": ["freetype::freetype"]},
-            "CSF_OpenGlLibs": {"externals": ["opengl::opengl"]},
-            "CSF_TclLibs": {"externals": ["tcl::tcl"]},
-            "CSF_TclTkLibs": {"externals": ["tk::tk"]},
-            "CSF_fontconfig": {"externals": ["fontconfig::fontconfig"] if self._is_linux else []},
-            "CSF_XwLibs": {"externals": ["xorg::xorg"] if self._is_linux else []},
+            # Mandatory dependencies (if modules using them are built)
+            "CSF_FREETYPE": {"externals": ["freetype::freetype"] if self._link_visualization_deps else []},
+            "CSF_OpenGlLibs": {"externals": ["opengl::opengl"] if self._link_visualization_deps else []},
+            "CSF_TclLibs": {"externals": ["tcl::tcl"] if self._link_tcl_tk else []},
+            "CSF_TclTkLibs": {"externals": ["tk::tk"] if self._link_tcl_tk else []},
+            "CSF_fontconfig": {"externals": ["fontconfig::fontconfig"] if self._is_linux and self._link_visualization_deps else []},
+            "CSF_XwLibs": {"externals": ["xorg::xorg"] if self._is_linux and self._link_visualization_deps else []},
             # Optional dependencies
-            "CSF_FFmpeg": {"externals": ["ffmpeg::ffmpeg"] if self.options.with_ffmpeg else []},
-            "CSF_FreeImagePlus": {"externals": ["freeimage::freeimage"] if self.options.with_freeimage else []},
-            "CSF_OpenVR": {"externals": ["openvr::openvr"] if self.options.with_openvr else []},
-            "CSF_RapidJSON": {"externals": ["rapidjson::rapidjson"] if self.options.with_rapidjson else []},
-            "CSF_TBB": {"externals": ["tbb::tbb"] if self.options.with_tbb else []},
+            "CSF_FFmpeg": {"externals": ["ffmpeg::ffmpeg"] if self.options.get_safe("with_ffmpeg") else []},
+            "CSF_FreeImagePlus": {"externals": ["freeimage::freeimage"] if self.options.get_safe("with_freeimage") else []},
+            "CSF_OpenVR": {"externals": ["openvr::openvr"] if self.options.get_safe("with_openvr") else []},
+            "CSF_RapidJSON": {"externals": ["rapidjson::rapidjson"] if self.options.get_safe("with_rapidjson") else []},
+            "CSF_TBB": {"externals": ([] if not self.options.with_tbb else
+                                      ["tbb::tbb"] if self.options.allocator == "tbb" else ["tbb::libtbb"])},
             "CSF_VTK": {},
             # Android system libs
             "CSF_androidlog": {"system_libs": ["log"] if self.settings.os == "Android" else []},
@@ -376,19 +1297,13 @@ class OpenCascadeConan(ConanFile):
 
         modules = {}
 
-        # MODULES file lists all modules and all possible components per module
-        modules_content = tools.load(os.path.join(self.build_folder, self._source_subfolder, "adm", "MODULES"))
         packaged_libs_list = tools.collect_libs(self, "lib")
-        for module_line in modules_content.splitlines():
+        for module_name, module_toolkits in self._parse_occt_graph().items():
             components = {}
-            module_components = module_line.split()
-            components_list = [component for component in module_components[1:] if component in packaged_libs_list]
+            components_list = [component for component in module_toolkits if component in packaged_libs_list]
             for component_name in components_list:
                 component_deps = {}
-                # EXTERNLIB file stores dependencies of each component. External dependencies are prefixed with CSF_
-                externlib_content = tools.load(os.path.join(self.build_folder, self._source_subfolder,
-                                               "src", component_name, "EXTERNLIB"))
-                for dependency in externlib_content.splitlines():
+                for dependency in module_toolkits[component_name]:
                     if dependency.startswith("TK") and dependency in packaged_libs_list:
                         component_deps.setdefault("internals", []).append(dependency)
                     elif dependency.startswith("CSF_"):
@@ -397,57 +1312,219 @@ class OpenCascadeConan(ConanFile):
                             if deps:
                                 component_deps.setdefault(dep_type, []).extend(deps)
                 components.update({component_name: component_deps})
-            modules.update({module_components[0]:components})
+            # Do not register modules which have not been built
+            if components:
+                modules.update({module_name: components})
+
+        return self._reduce_modules_graph(modules)
+
+    @staticmethod
+    def _reduce_modules_graph(modules):
+        # Transitive reduction of EXTERNLIB graph: a dependency (toolkit, external, system lib or framework)
+        # already brought by another dependency is removed. Modules & toolkits are sorted in topological
+        # order (dependencies first), so that reversed order is a valid static link order
+        toolkits_deps = {toolkit: deps for components in modules.values() for toolkit, deps in components.items()}
+        toolkit_to_module = {toolkit: module for module, components in modules.items() for toolkit in components}
+
+        closures = {}
+
+        def _get_closure(toolkit):
+            if toolkit not in closures:
+                closure = set()
+                for internal in toolkits_deps[toolkit].get("internals", []):
+                    closure.add(internal)
+                    closure.update(_get_closure(internal))
+                closures[toolkit] = closure
+            return closures[toolkit]
+
+        def _topological_sort(nodes, get_dependencies):
+            sorted_nodes = []
+            visited = set()
+
+            def _visit(node):
+                if node not in visited:
+                    visited.add(node)
+                    for dependency in get_dependencies(node):
+                        _visit(dependency)
+                    sorted_nodes.append(node)
+
+            for node in nodes:
+                _visit(node)
+            return sorted_nodes
 
-        return modules
+        reduced_deps = {}
+        for toolkit, deps in toolkits_deps.items():
+            closure = _get_closure(toolkit)
+            indirect_internals = set(indirect for internal in closure for indirect in _get_closure(internal))
+            toolkit_reduced_deps = {}
+            for dep_type, values in deps.items():
+                if dep_type == "internals":
+                    redundant = indirect_internals
+                else:
+                    redundant = set(value for internal in closure for value in toolkits_deps[internal].get(dep_type, []))
+                kept = []
+                for value in values:
+                    if value not in redundant and value not in kept:
+                        kept.append(value)
+                if kept:
+                    toolkit_reduced_deps[dep_type] = kept
+            reduced_deps[toolkit] = toolkit_reduced_deps
 
-    def _create_modules_json_file(self, modules):
-        tools.save(self._modules_helper_filepath, json.dumps(modules, indent=4))
+        modules_order = _topological_sort(modules, lambda module: [
+            toolkit_to_module[internal] for toolkit in modules[module]
+            for internal in reduced_deps[toolkit].get("internals", []) if toolkit_to_module[internal] != module])
+        toolkits_order = _topological_sort(toolkits_deps, lambda toolkit: reduced_deps[toolkit].get("internals", []))
+        return {module: {toolkit: reduced_deps[toolkit] for toolkit in toolkits_order if toolkit_to_module[toolkit] == module}
+                for module in modules_order}
+
+    def _parse_occt_graph(self):
+        occt_graph = {}
+        source_folder = os.path.join(self.build_folder, self._source_subfolder)
+        # MODULES file lists all modules and all possible components per module
+        modules_content = tools.load(os.path.join(source_folder, "adm", "MODULES"))
+        for module_line in modules_content.splitlines():
+            module_components = module_line.split()
+            if not module_components:
+                continue
+            toolkits = {}
+            for component_name in module_components[1:]:
+                # EXTERNLIB file stores dependencies of each component. External dependencies are prefixed with CSF_
+                externlib_path = os.path.join(source_folder, "src", component_name, "EXTERNLIB")
+                externlib_content = tools.load(externlib_path) if os.path.isfile(externlib_path) else ""
+                toolkits[component_name] = [dependency.strip() for dependency in externlib_content.splitlines() if dependency.strip()]
+            occt_graph[module_components[0]] = toolkits
+        return occt_graph
+
+    @classmethod
+    def _save_modules_manifest(cls, file_path, modules):
+        # Compact manifest, ready to be registered by package_info():
+        # - toolkits: [name, internals, externals, system_libs, frameworks], in topological order
+        # - modules: [name, toolkits, toolkits not already required by another toolkit of the module]
+        toolkits = []
+        modules_list = []
+        for module, module_toolkits in modules.items():
+            module_internals = set(internal for deps in module_toolkits.values() for internal in deps.get("internals", []))
+            modules_list.append([module, list(module_toolkits),
+                                 [toolkit for toolkit in module_toolkits if toolkit not in module_internals]])
+            for toolkit, deps in module_toolkits.items():
+                toolkits.append([toolkit] + [deps.get(dep_type, []) for dep_type in ["internals", "externals", "system_libs", "frameworks"]])
+        manifest = {"version": cls._modules_manifest_version, "toolkits": toolkits, "modules": modules_list}
+        cls._check_modules_manifest(manifest, file_path)
+        tools.save(file_path, json.dumps(manifest, separators=(",", ":")))
+
+    @classmethod
+    def _check_modules_manifest(cls, manifest, file_path):
+        def _is_list_of_str(value):
+            return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+        def _invalid(reason):
+            return ConanException("Invalid components manifest {} ({}), package must be rebuilt".format(file_path, reason))
+
+        if not isinstance(manifest, dict) or manifest.get("version") != cls._modules_manifest_version:
+            raise _invalid("version {} expected".format(cls._modules_manifest_version))
+        if not isinstance(manifest.get("toolkits"), list) or not isinstance(manifest.get("modules"), list):
+            raise _invalid("toolkits and modules lists expected")
+        toolkits = set()
+        for toolkit in manifest["toolkits"]:
+            if not isinstance(toolkit, list) or len(toolkit) != 5 or not isinstance(toolkit[0], str) or \
+               not all(_is_list_of_str(field) for field in toolkit[1:]):
+                raise _invalid("malformed toolkit {}".format(toolkit))
+            # Topological order: internal dependencies are listed before
+            if not toolkits.issuperset(toolkit[1]):
+                raise _invalid("{} listed before its dependencies".format(toolkit[0]))
+            toolkits.add(toolkit[0])
+        for module in manifest["modules"]:
+            if not isinstance(module, list) or len(module) != 3 or not isinstance(module[0], str) or \
+               not _is_list_of_str(module[1]) or not _is_list_of_str(module[2]) or \
+               not toolkits.issuperset(module[1]) or not set(module[1]).issuperset(module[2]):
+                raise _invalid("malformed module {}".format(module))
+
+    @classmethod
+    def _load_modules_manifest(cls, file_path):
+        file_stat = os.stat(file_path)
+        cache_key = (file_path, file_stat.st_mtime, file_stat.st_size)
+        manifest = cls._modules_manifest_cache.get(cache_key)
+        if manifest is None:
+            manifest = json.loads(tools.load(file_path))
+            cls._check_modules_manifest(manifest, file_path)
+            cls._modules_manifest_cache[cache_key] = manifest
+        return manifest
 
     @property
     def _modules_helper_filepath(self):
         return os.path.join(self.package_folder, "lib", "occt_modules.json")
 
+    @property
+    def _lto_link_flags(self):
+        # Static libs built with LTO only contain bitcode, consumers must link them with LTO
+        if not self.options.lto or self.options.shared:
+            return []
+        if self.settings.compiler == "Visual Studio":
+            return ["/LTCG"]
+        if self.settings.compiler in ["clang", "apple-clang"]:
+            return ["-flto=thin"]
+        return ["-flto"]
+
     def package_info(self):
         self.cpp_info.names["cmake_find_package"] = "OpenCASCADE"
         self.cpp_info.names["cmake_find_package_multi"] = "OpenCASCADE"
 
+        lto_link_flags = self._lto_link_flags
+        if lto_link_flags:
+            self.output.info("Static libraries contain LTO bitcode, consumers are linked with {}".format(" ".join(lto_link_flags)))
+        self.user_info.lto_bitcode = bool(lto_link_flags)
+        link_flags = lto_link_flags + (self._gc_sections_link_flags if self.options.gc_sections else [])
+
         def _to_qualified_name(target):
             return "occt_{}".format(target.lower())
 
-        def _register_components(modules_dict):
-            for module, targets in modules_dict.items():
-                conan_component_module_name = _to_qualified_name(module)
-                self.cpp_info.components[conan_component_module_name].names["cmake_find_package"] = module
-                self.cpp_info.components[conan_component_module_name].names["cmake_find_package_multi"] = module
-
-                for target_lib, target_deps in targets.items():
-                    conan_component_target_name = _to_qualified_name(target_lib)
-                    requires = [_to_qualified_name(internal) for internal in target_deps.get("internals", [])] + \
-                               target_deps.get("externals", [])
-                    system_libs = target_deps.get("system_libs", [])
-                    frameworks = target_deps.get("frameworks", [])
-
-                    self.cpp_info.components[conan_component_target_name].names["cmake_find_package"] = target_lib
-                    self.cpp_info.components[conan_component_target_name].names["cmake_find_package_multi"] = target_lib
-                    self.cpp_info.components[conan_component_target_name].builddirs.append(self._cmake_module_subfolder)
-                    self.cpp_info.components[conan_component_target_name].build_modules["cmake_find_package"] = [self._cmake_module_file_rel_path]
-                    self.cpp_info.components[conan_component_target_name].build_modules["cmake_find_package_multi"] = [self._cmake_module_file_rel_path]
-                    self.cpp_info.components[conan_component_target_name].libs = [target_lib]
-                    self.cpp_info.components[conan_component_target_name].requires = requires
-                    self.cpp_info.components[conan_component_target_name].system_libs = system_libs
-                    self.cpp_info.components[conan_component_target_name].frameworks = frameworks
-                    if self.settings.os == "Windows" and not self.options.shared:
-                        self.cpp_info.components[conan_component_target_name].defines.append("OCCT_STATIC_BUILD")
-
-                    self.cpp_info.components[conan_component_module_name].requires.append(conan_component_target_name)
-
-        occt_modules_json_content = tools.load(self._modules_helper_filepath)
-        occt_modules = json.loads(occt_modules_json_content)
-        _register_components(occt_modules)
+        manifest = self._load_modules_manifest(self._modules_helper_filepath)
+        components = self.cpp_info.components
+        build_modules = [self._cmake_module_file_rel_path]
+        defines = ["OCCT_STATIC_BUILD"] if self.settings.os == "Windows" and not self.options.shared else []
+
+        for target_lib, internals, externals, system_libs, frameworks in manifest["toolkits"]:
+            component = components[_to_qualified_name(target_lib)]
+            component.names["cmake_find_package"] = target_lib
+            component.names["cmake_find_package_multi"] = target_lib
+            component.builddirs.append(self._cmake_module_subfolder)
+            component.build_modules["cmake_find_package"] = list(build_modules)
+            component.build_modules["cmake_find_package_multi"] = list(build_modules)
+            component.libs = [target_lib]
+            # Manifest is cached, components must not share its lists
+            component.requires = [_to_qualified_name(internal) for internal in internals] + externals
+            component.system_libs = list(system_libs)
+            component.frameworks = list(frameworks)
+            component.sharedlinkflags = list(link_flags)
+            component.exelinkflags = list(link_flags)
+            component.defines = list(defines)
+
+        for module, _, module_requires in manifest["modules"]:
+            component = components[_to_qualified_name(module)]
+            component.names["cmake_find_package"] = module
+            component.names["cmake_find_package_multi"] = module
+            component.requires = [_to_qualified_name(toolkit) for toolkit in module_requires]
+
+        # Default allocator is also exported for consumers
+        self.output.info("Setting MMGT_OPT environment variable: {}".format(self._mmgt_opt))
+        self.env_info.MMGT_OPT = str(self._mmgt_opt)
+
+        if self.options.get_safe("separate_debug_info"):
+            debug_folder = os.path.join(self.package_folder, self._debug_folder)
+            self.output.info("Debug info of OpenCASCADE is in {}, to be added to debug-file-directory of debugger".format(debug_folder))
+            self.user_info.debug_file_directory = debug_folder
+
+        # Resource files which are not embedded are located through environment variables
+        resources_path = os.path.join(self.package_folder, self._resources_folder)
+        for env_var, resource_relpath in self._resources_env_vars.items():
+            if self.options.embed_resources and (not resource_relpath or resource_relpath.split(os.sep)[0] in self._embedded_resources):
+                continue
+            resource_path = os.path.join(resources_path, resource_relpath)
+            if os.path.exists(resource_path):
+                setattr(self.env_info, env_var, resource_path)
 
         # DRAWEXE executable is not created if static build
-        if self.options.shared:
+        if self.options.shared and self.options.with_draw:
             bin_path = os.path.join(self.package_folder, "bin")
             self.output.info("Appending PATH environment variable: {}".format(bin_path))
             self.env_info.PATH.append(bin_path)
@@ -0,0 +1,138 @@
+// Training workload for PGO builds of OpenCASCADE.
+// Shapes are generated locally, so that training is reproducible and doesn't require any external data.
+
+#include <BRepAlgoAPI_Common.hxx>
+#include <BRepAlgoAPI_Cut.hxx>
+#include <BRepAlgoAPI_Fuse.hxx>
+#include <BRepExtrema_DistShapeShape.hxx>
+#include <BRepMesh_IncrementalMesh.hxx>
+#include <BRepPrimAPI_MakeBox.hxx>
+#include <BRepPrimAPI_MakeCylinder.hxx>
+#include <BRepPrimAPI_MakeSphere.hxx>
+#include <BRepPrimAPI_MakeTorus.hxx>
+#include <IFSelect_ReturnStatus.hxx>
+#include <IGESControl_Controller.hxx>
+#include <IGESControl_Reader.hxx>
+#include <IGESControl_Writer.hxx>
+#include <STEPControl_Reader.hxx>
+#include <STEPControl_Writer.hxx>
+#include <TopoDS_Shape.hxx>
+#include <gp_Ax2.hxx>
+#include <gp_Pnt.hxx>
+
+#include <chrono>
+#include <cstdlib>
+#include <iostream>
+#include <string>
+#include <vector>
+
+namespace {
+
+std::vector<TopoDS_Shape> make_primitives(int index) {
+    const double offset = 0.25 * index;
+    std::vector<TopoDS_Shape> shapes;
+    shapes.push_back(BRepPrimAPI_MakeBox(gp_Pnt(offset, 0, 0), 10.0, 8.0 + offset, 6.0).Shape());
+    shapes.push_back(BRepPrimAPI_MakeCylinder(gp_Ax2(gp_Pnt(5, 4, -2), gp_Dir(0, 0, 1)), 2.5 + 0.1 * index, 12.0).Shape());
+    shapes.push_back(BRepPrimAPI_MakeSphere(gp_Pnt(10, 8, 6), 4.0 + 0.1 * index).Shape());
+    shapes.push_back(BRepPrimAPI_MakeTorus(gp_Ax2(gp_Pnt(5, 4, 3), gp_Dir(1, 0, 0)), 5.0, 1.0 + 0.05 * index).Shape());
+    return shapes;
+}
+
+std::vector<TopoDS_Shape> run_booleans(const std::vector<TopoDS_Shape>& primitives) {
+    std::vector<TopoDS_Shape> results;
+    BRepAlgoAPI_Fuse fuse(primitives[0], primitives[2]);
+    if (fuse.IsDone()) {
+        results.push_back(fuse.Shape());
+    }
+    BRepAlgoAPI_Cut cut(primitives[0], primitives[1]);
+    if (cut.IsDone()) {
+        results.push_back(cut.Shape());
+    }
+    BRepAlgoAPI_Common common(primitives[2], primitives[3]);
+    if (common.IsDone()) {
+        results.push_back(common.Shape());
+    }
+    return results;
+}
+
+void run_meshing(const std::vector<TopoDS_Shape>& shapes) {
+    const double deflections[] = {0.5, 0.1, 0.02};
+    for (const TopoDS_Shape& shape : shapes) {
+        for (double deflection : deflections) {
+            BRepMesh_IncrementalMesh mesh(shape, deflection, Standard_False, 0.5, Standard_False);
+        }
+    }
+}
+
+void run_distances(const std::vector<TopoDS_Shape>& shapes) {
+    for (size_t i = 0; i < shapes.size(); ++i) {
+        for (size_t j = i + 1; j < shapes.size(); ++j) {
+            BRepExtrema_DistShapeShape distance(shapes[i], shapes[j]);
+            if (!distance.IsDone()) {
+                std::cerr << "BRepExtrema_DistShapeShape failed" << std::endl;
+            }
+        }
+    }
+}
+
+bool run_step_round_trip(const TopoDS_Shape& shape, const std::string& path) {
+    STEPControl_Writer writer;
+    if (writer.Transfer(shape, STEPControl_AsIs) != IFSelect_RetDone || writer.Write(path.c_str()) != IFSelect_RetDone) {
+        return false;
+    }
+    STEPControl_Reader reader;
+    if (reader.ReadFile(path.c_str()) != IFSelect_RetDone) {
+        return false;
+    }
+    reader.TransferRoots();
+    return !reader.OneShape().IsNull();
+}
+
+bool run_iges_round_trip(const TopoDS_Shape& shape, const std::string& path) {
+    IGESControl_Writer writer("MM", 0);
+    writer.AddShape(shape);
+    writer.ComputeModel();
+    if (!writer.Write(path.c_str())) {
+        return false;
+    }
+    IGESControl_Reader reader;
+    if (reader.ReadFile(path.c_str()) != IFSelect_RetDone) {
+        return false;
+    }
+    reader.TransferRoots();
+    return !reader.OneShape().IsNull();
+}
+
+}  // namespace
+
+int main(int argc, char** argv) {
+    if (argc < 2) {
+        std::cerr << "Usage: " << argv[0] << " <working_dir> [iterations]" << std::endl;
+        return 1;
+    }
+    const std::string working_dir = argv[1];
+    const int iterations = argc > 2 ? std::atoi(argv[2]) : 4;
+
+    IGESControl_Controller::Init();
+
+    const auto start = std::chrono::steady_clock::now();
+    bool ok = true;
+    for (int i = 0; i < iterations; ++i) {
+        std::vector<TopoDS_Shape> shapes = make_primitives(i);
+        std::vector<TopoDS_Shape> results = run_booleans(shapes);
+        shapes.insert(shapes.end(), results.begin(), results.end());
+        run_meshing(shapes);
+        run_distances(shapes);
+        for (size_t j = 0; j < results.size(); ++j) {
+            const std::string base_path = working_dir + "/training_" + std::to_string(i) + "_" + std::to_string(j);
+            ok = run_step_round_trip(results[j], base_path + ".step") && ok;
+            ok = run_iges_round_trip(results[j], base_path + ".igs") && ok;
+        }
+    }
+    const std::chrono::duration<double> elapsed = std::chrono::steady_clock::now() - start;
+    std::cout << "PGO training: " << iterations << " iterations in " << elapsed.count() << " s" << std::endl;
+    if (!ok) {
+        std::cerr << "Some data exchange round-trips failed" << std::endl;
+    }
+    return ok ? 0 : 1;
+}
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+"""Micro-benchmark of package_info() and _create_cmake_module_alias_targets() of opencascade recipe.
+
+Usage: bench_package_info.py [--repetitions N] [--max-ms MS] [--output FILE]
+
+A synthetic package folder with a components manifest of the size of a full OCCT build is
+generated, then recipe methods are timed with a cold and a warm manifest cache. With --max-ms,
+exits with an error if median time of package_info() with cold cache is above the threshold,
+so that regressions are caught in CI. Requires conan 1.x.
+"""
+
+import argparse
+import importlib.util
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from conans.client.output import ConanOutput
+from conans.model.build_info import CppInfo
+from conans.model.env_info import EnvInfo, EnvValues
+from conans.model.settings import Settings
+from conans.model.user_info import UserInfo
+
+try:
+    from conans.client.conf import get_default_settings_yml
+except ImportError:  # conan < 1.21
+    from conans.client.conf import default_settings_yml
+
+    def get_default_settings_yml():
+        return default_settings_yml
+
+RECIPE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "conanfile.py")
+
+
+def _load_recipe_class():
+    spec = importlib.util.spec_from_file_location("opencascade_recipe", RECIPE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.OpenCascadeConan
+
+
+def _create_synthetic_modules(modules_count=7, toolkits_per_module=10):
+    # Each toolkit depends on the two previous ones, like chains of OCCT toolkits
+    modules = {}
+    toolkits = []
+    for module_index in range(modules_count):
+        module_toolkits = {}
+        for toolkit_index in range(toolkits_per_module):
+            toolkit = "TKBench{}x{}".format(module_index, toolkit_index)
+            deps = {"internals": toolkits[-2:]} if toolkits else {}
+            if toolkit_index == 0:
+                deps["externals"] = ["dep{}::dep{}".format(module_index, module_index)]
+            if not toolkits:
+                deps["system_libs"] = ["pthread", "rt", "dl"]
+            module_toolkits[toolkit] = deps
+            toolkits.append(toolkit)
+        modules["BenchModule{}".format(module_index)] = module_toolkits
+    return modules
+
+
+def _create_recipe(recipe_class, package_folder):
+    # Same steps as conan before calling package_info(): real settings & options, and fresh info objects
+    recipe = recipe_class(ConanOutput(io.StringIO()), None, display_name="opencascade/bench")
+    settings = Settings.loads(get_default_settings_yml())
+    settings.os = "Linux"
+    settings.arch = "x86_64"
+    settings.compiler = "gcc"
+    settings.compiler.version = "10"
+    settings.compiler.libcxx = "libstdc++11"
+    settings.build_type = "Release"
+    recipe.initialize(settings, EnvValues())
+    recipe.options.shared = True
+    recipe.options.with_draw = False
+    recipe.config_options()
+    recipe.configure()
+    if getattr(recipe, "folders", None) is not None and hasattr(recipe.folders, "set_base_package"):
+        recipe.folders.set_base_package(package_folder)
+    else:  # conan < 1.37, package_folder is a plain attribute
+        recipe.package_folder = package_folder
+    recipe.cpp_info = CppInfo("opencascade", package_folder)
+    recipe.env_info = EnvInfo()
+    recipe.user_info = UserInfo()
+    return recipe
+
+
+def _time_ms(function, repetitions, setup=None):
+    # setup() is not timed, its result is passed to function()
+    samples = []
+    for _ in range(repetitions):
+        argument = setup() if setup else None
+        start = time.perf_counter()
+        function(argument)
+        samples.append((time.perf_counter() - start) * 1000.0)
+    samples.sort()
+    return {"min_ms": samples[0], "median_ms": samples[len(samples) // 2], "max_ms": samples[-1]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repetitions", type=int, default=50)
+    parser.add_argument("--max-ms", type=float, default=None)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    recipe_class = _load_recipe_class()
+    package_folder = tempfile.mkdtemp(prefix="occt_bench_package_info_")
+    try:
+        modules = _create_synthetic_modules()
+        manifest_path = os.path.join(package_folder, "lib", "occt_modules.json")
+        recipe_class._save_modules_manifest(manifest_path, modules)
+        alias_targets = {toolkit: "OpenCASCADE::{}".format(toolkit) for toolkits in modules.values() for toolkit in toolkits}
+        alias_file = os.path.join(package_folder, "lib", "cmake", "conan-official-opencascade-targets.cmake")
+
+        def _create_recipe_with_cold_cache():
+            recipe_class._modules_manifest_cache.clear()
+            return _create_recipe(recipe_class, package_folder)
+
+        results = {
+            "components": sum(len(toolkits) for toolkits in modules.values()) + len(modules),
+            "package_info_cold_cache": _time_ms(
+                lambda recipe: recipe.package_info(), args.repetitions, setup=_create_recipe_with_cold_cache),
+            "package_info_warm_cache": _time_ms(
+                lambda recipe: recipe.package_info(), args.repetitions,
+                setup=lambda: _create_recipe(recipe_class, package_folder)),
+            "create_cmake_module_alias_targets": _time_ms(
+                lambda _: recipe_class._create_cmake_module_alias_targets(alias_file, alias_targets), args.repetitions),
+        }
+    finally:
+        shutil.rmtree(package_folder)
+
+    print(json.dumps(results, indent=4))
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=4)
+    if args.max_ms is not None and results["package_info_cold_cache"]["median_ms"] > args.max_ms:
+        print("package_info() median time is above {} ms".format(args.max_ms), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+"""Compiler & linker launcher recording wall time of each build step (build_profile option).
+
+Usage: occt_build_timer.py <log_file> <compile|link> <target_name> <output> -- <command>...
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+def main():
+    separator = sys.argv.index("--")
+    log_file, step, target_name, output = sys.argv[1:separator]
+    command = sys.argv[separator + 1:]
+
+    start = time.time()
+    returncode = subprocess.call(command)
+    wall_time = time.time() - start
+
+    # One line per build step, small appends are not interleaved between concurrent jobs
+    record = {
+        "step": step,
+        "target": target_name,
+        "output": os.path.abspath(output),
+        "wall_time_s": wall_time,
+        "returncode": returncode,
+    }
+    log_folder = os.path.dirname(log_file)
+    if log_folder and not os.path.isdir(log_folder):
+        try:
+            os.makedirs(log_folder)
+        except OSError:
+            # Created by a concurrent build step
+            if not os.path.isdir(log_folder):
+                raise
+    with open(log_file, "a") as log:
+        log.write(json.dumps(record) + "\n")
+    return returncode
+
+
+if __name__ == "__main__":
+    sys.exit(main())
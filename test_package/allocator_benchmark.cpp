@@ -0,0 +1,57 @@
+// Allocation-heavy multithreaded workload, run with each MMGT_OPT memory manager.
+
+#include "benchmark_utils.hpp"
+
+#include <Geom_CartesianPoint.hxx>
+#include <NCollection_Sequence.hxx>
+#include <NCollection_Vector.hxx>
+#include <OSD_Parallel.hxx>
+#include <Standard.hxx>
+
+namespace {
+
+// Raw blocks of various sizes, as done by OCCT containers
+struct RawAllocations {
+    void operator()(int index) const {
+        void* blocks[64];
+        for (int iteration = 0; iteration < 200; ++iteration) {
+            for (int i = 0; i < 64; ++i) {
+                blocks[i] = Standard::Allocate(16 + ((index + i * 37) % 32) * 24);
+            }
+            for (int i = 0; i < 64; ++i) {
+                Standard::Free(blocks[i]);
+            }
+        }
+    }
+};
+
+// Small transient objects and collections, typical of modeling algorithms
+struct ObjectsAllocations {
+    void operator()(int index) const {
+        for (int iteration = 0; iteration < 20; ++iteration) {
+            NCollection_Sequence<Handle(Geom_CartesianPoint)> points;
+            NCollection_Vector<gp_Pnt> coordinates;
+            for (int i = 0; i < 100; ++i) {
+                points.Append(new Geom_CartesianPoint(index, iteration, i));
+                coordinates.Append(points.Last()->Pnt());
+            }
+        }
+    }
+};
+
+}  // namespace
+
+int main(int argc, char** argv) {
+    const bench::Options options = bench::parse_options(argc, argv);
+    const int nb_tasks = 4096;
+
+    std::vector<bench::Result> results;
+    results.push_back(bench::run(options, "raw_allocations", [&] {
+        OSD_Parallel::For(0, nb_tasks, RawAllocations());
+    }));
+    results.push_back(bench::run(options, "objects_allocations", [&] {
+        OSD_Parallel::For(0, nb_tasks, ObjectsAllocations());
+    }));
+
+    return bench::write_json(options, "occt_allocator", results) ? 0 : 1;
+}
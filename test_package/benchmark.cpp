@@ -0,0 +1,116 @@
+// Performance benchmark of common OpenCASCADE workloads, used to compare packages
+// built with different profiles and options. Results are written as JSON.
+
+#include "benchmark_shapes.hpp"
+#include "benchmark_utils.hpp"
+
+#include <BinTools.hxx>
+#include <BRep_Builder.hxx>
+#include <BRepMesh_IncrementalMesh.hxx>
+#include <BRepPrimAPI_MakeBox.hxx>
+#include <BRepPrimAPI_MakeCylinder.hxx>
+#include <BRepPrimAPI_MakeSphere.hxx>
+#include <BRepTools.hxx>
+#include <TopoDS_Compound.hxx>
+#include <TopoDS_Shape.hxx>
+#include <gp_Trsf.hxx>
+
+#ifdef OCCT_BENCHMARK_WITH_DATA_EXCHANGE
+#include <IFSelect_ReturnStatus.hxx>
+#include <Interface_Static.hxx>
+#include <STEPControl_Controller.hxx>
+#include <STEPControl_Reader.hxx>
+#include <STEPControl_Writer.hxx>
+#endif
+
+#include <sstream>
+
+namespace {
+
+TopoDS_Shape make_assembly(const TopoDS_Shape& part, int count_per_side) {
+    BRep_Builder builder;
+    TopoDS_Compound assembly;
+    builder.MakeCompound(assembly);
+    for (int i = 0; i < count_per_side; ++i) {
+        for (int j = 0; j < count_per_side; ++j) {
+            gp_Trsf translation;
+            translation.SetTranslation(gp_Vec(120.0 * i, 120.0 * j, 0.0));
+            builder.Add(assembly, part.Moved(TopLoc_Location(translation)));
+        }
+    }
+    return assembly;
+}
+
+}  // namespace
+
+int main(int argc, char** argv) {
+    const bench::Options options = bench::parse_options(argc, argv);
+    std::vector<bench::Result> results;
+
+    results.push_back(bench::run(options, "primitives", [] {
+        for (int i = 0; i < 200; ++i) {
+            BRepPrimAPI_MakeBox(10.0 + i, 20.0, 30.0).Shape();
+            BRepPrimAPI_MakeCylinder(5.0, 10.0 + i).Shape();
+            BRepPrimAPI_MakeSphere(5.0 + i).Shape();
+        }
+    }));
+
+    const TopTools_ListOfShape plate = bench::make_plate();
+    const TopTools_ListOfShape holes = bench::make_holes_tools(8);
+    const TopTools_ListOfShape spheres = bench::make_spheres_tools(6);
+    TopoDS_Shape cut_result;
+    TopoDS_Shape fuse_result;
+    results.push_back(bench::run(options, "boolean_cut", [&] { cut_result = bench::run_cut(plate, holes); }));
+    results.push_back(bench::run(options, "boolean_fuse", [&] { fuse_result = bench::run_fuse(plate, spheres); }));
+    if (cut_result.IsNull() || fuse_result.IsNull()) {
+        std::cerr << "Boolean operation failed" << std::endl;
+        return 1;
+    }
+
+    const double deflections[] = {0.5, 0.1, 0.02};
+    for (double deflection : deflections) {
+        std::ostringstream name;
+        name << "mesh_deflection_" << deflection;
+        results.push_back(bench::run(options, name.str(),
+            [&] { BRepMesh_IncrementalMesh mesher(fuse_result, deflection, Standard_False, 0.5, Standard_False); },
+            [&] { BRepTools::Clean(fuse_result); }));
+    }
+
+    results.push_back(bench::run(options, "brep_round_trip", [&] {
+        std::stringstream stream;
+        BRepTools::Write(fuse_result, stream);
+        TopoDS_Shape shape;
+        BRep_Builder builder;
+        BRepTools::Read(shape, stream, builder);
+    }));
+    results.push_back(bench::run(options, "bintools_round_trip", [&] {
+        std::stringstream stream;
+        BinTools::Write(fuse_result, stream);
+        TopoDS_Shape shape;
+        BinTools::Read(shape, stream);
+    }));
+
+#ifdef OCCT_BENCHMARK_WITH_DATA_EXCHANGE
+    const TopoDS_Shape assembly = make_assembly(cut_result, 4);
+    const std::string step_file = options.output + ".step";
+    // Static parameters of STEP translator are registered by its controller
+    STEPControl_Controller::Init();
+    if (!Interface_Static::SetIVal("write.step.assembly", 1)) {
+        std::cerr << "Can't enable write.step.assembly" << std::endl;
+        return 1;
+    }
+    results.push_back(bench::run(options, "step_export_assembly", [&] {
+        STEPControl_Writer writer;
+        writer.Transfer(assembly, STEPControl_AsIs);
+        writer.Write(step_file.c_str());
+    }));
+    results.push_back(bench::run(options, "step_import_assembly", [&] {
+        STEPControl_Reader reader;
+        if (reader.ReadFile(step_file.c_str()) == IFSelect_RetDone) {
+            reader.TransferRoots();
+        }
+    }));
+#endif
+
+    return bench::write_json(options, "occt_workloads", results) ? 0 : 1;
+}
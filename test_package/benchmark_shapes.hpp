@@ -0,0 +1,70 @@
+// Synthetic shapes and boolean operations shared by test_package benchmarks.
+
+#ifndef OCCT_TEST_PACKAGE_BENCHMARK_SHAPES_HPP
+#define OCCT_TEST_PACKAGE_BENCHMARK_SHAPES_HPP
+
+#include <BRepAlgoAPI_Cut.hxx>
+#include <BRepAlgoAPI_Fuse.hxx>
+#include <BRepPrimAPI_MakeBox.hxx>
+#include <BRepPrimAPI_MakeCylinder.hxx>
+#include <BRepPrimAPI_MakeSphere.hxx>
+#include <TopoDS_Shape.hxx>
+#include <TopTools_ListOfShape.hxx>
+#include <gp_Ax2.hxx>
+
+namespace bench {
+
+// Cylinders drilling a grid of holes through the plate
+inline TopTools_ListOfShape make_holes_tools(int count_per_side) {
+    TopTools_ListOfShape tools;
+    const double step = 100.0 / count_per_side;
+    for (int i = 0; i < count_per_side; ++i) {
+        for (int j = 0; j < count_per_side; ++j) {
+            const gp_Pnt center((i + 0.5) * step, (j + 0.5) * step, -5.0);
+            tools.Append(BRepPrimAPI_MakeCylinder(gp_Ax2(center, gp::DZ()), 0.3 * step, 20.0).Shape());
+        }
+    }
+    return tools;
+}
+
+// Grid of spheres intersecting the top face of the plate
+inline TopTools_ListOfShape make_spheres_tools(int count_per_side) {
+    TopTools_ListOfShape tools;
+    const double step = 100.0 / count_per_side;
+    for (int i = 0; i < count_per_side; ++i) {
+        for (int j = 0; j < count_per_side; ++j) {
+            tools.Append(BRepPrimAPI_MakeSphere(gp_Pnt((i + 0.5) * step, (j + 0.5) * step, 10.0), 0.4 * step).Shape());
+        }
+    }
+    return tools;
+}
+
+inline TopTools_ListOfShape make_plate() {
+    TopTools_ListOfShape arguments;
+    arguments.Append(BRepPrimAPI_MakeBox(100.0, 100.0, 10.0).Shape());
+    return arguments;
+}
+
+inline TopoDS_Shape run_cut(const TopTools_ListOfShape& arguments, const TopTools_ListOfShape& tools,
+                            bool parallel = false) {
+    BRepAlgoAPI_Cut cut;
+    cut.SetArguments(arguments);
+    cut.SetTools(tools);
+    cut.SetRunParallel(parallel);
+    cut.Build();
+    return cut.IsDone() ? cut.Shape() : TopoDS_Shape();
+}
+
+inline TopoDS_Shape run_fuse(const TopTools_ListOfShape& arguments, const TopTools_ListOfShape& tools,
+                             bool parallel = false) {
+    BRepAlgoAPI_Fuse fuse;
+    fuse.SetArguments(arguments);
+    fuse.SetTools(tools);
+    fuse.SetRunParallel(parallel);
+    fuse.Build();
+    return fuse.IsDone() ? fuse.Shape() : TopoDS_Shape();
+}
+
+}  // namespace bench
+
+#endif
@@ -0,0 +1,134 @@
+// Minimal timing harness shared by test_package benchmarks, results are written as JSON.
+
+#ifndef OCCT_TEST_PACKAGE_BENCHMARK_UTILS_HPP
+#define OCCT_TEST_PACKAGE_BENCHMARK_UTILS_HPP
+
+#include <algorithm>
+#include <chrono>
+#include <cstdlib>
+#include <fstream>
+#include <functional>
+#include <iostream>
+#include <map>
+#include <numeric>
+#include <string>
+#include <vector>
+
+namespace bench {
+
+struct Options {
+    int warmup = 1;
+    int repetitions = 3;
+    std::string output = "benchmark_results.json";
+    std::string label;
+    int max_threads = 0;  // 0 means all hardware threads
+};
+
+struct Result {
+    std::string name;
+    std::vector<double> samples;
+    std::map<std::string, double> metrics;
+};
+
+// Parses --warmup N --repetitions N --output FILE --label TEXT --max-threads N
+inline Options parse_options(int argc, char** argv) {
+    Options options;
+    for (int i = 1; i + 1 < argc; i += 2) {
+        const std::string key = argv[i];
+        const std::string value = argv[i + 1];
+        if (key == "--warmup") {
+            options.warmup = std::atoi(value.c_str());
+        } else if (key == "--repetitions") {
+            options.repetitions = std::max(1, std::atoi(value.c_str()));
+        } else if (key == "--output") {
+            options.output = value;
+        } else if (key == "--label") {
+            options.label = value;
+        } else if (key == "--max-threads") {
+            options.max_threads = std::atoi(value.c_str());
+        } else {
+            std::cerr << "Unknown argument: " << key << std::endl;
+        }
+    }
+    return options;
+}
+
+inline double elapsed_seconds(const std::function<void()>& body) {
+    const auto start = std::chrono::steady_clock::now();
+    body();
+    const std::chrono::duration<double> elapsed = std::chrono::steady_clock::now() - start;
+    return elapsed.count();
+}
+
+// Runs body warmup + repetitions times, setup is called before each run and is not timed
+inline Result run(const Options& options, const std::string& name,
+                  const std::function<void()>& body,
+                  const std::function<void()>& setup = std::function<void()>()) {
+    Result result;
+    result.name = name;
+    for (int i = 0; i < options.warmup + options.repetitions; ++i) {
+        if (setup) {
+            setup();
+        }
+        const double seconds = elapsed_seconds(body);
+        if (i >= options.warmup) {
+            result.samples.push_back(seconds);
+        }
+    }
+    std::cout << name << ": " << *std::min_element(result.samples.begin(), result.samples.end()) << " s (min)" << std::endl;
+    return result;
+}
+
+inline double median(std::vector<double> values) {
+    std::sort(values.begin(), values.end());
+    const size_t middle = values.size() / 2;
+    return values.size() % 2 ? values[middle] : 0.5 * (values[middle - 1] + values[middle]);
+}
+
+inline std::string escape(const std::string& text) {
+    std::string escaped;
+    for (char c : text) {
+        if (c == '"' || c == '\\') {
+            escaped += '\\';
+        }
+        escaped += c;
+    }
+    return escaped;
+}
+
+inline bool write_json(const Options& options, const std::string& suite, const std::vector<Result>& results) {
+    std::ofstream out(options.output.c_str());
+    if (!out) {
+        std::cerr << "Can't write " << options.output << std::endl;
+        return false;
+    }
+    out.precision(9);
+    out << "{\n";
+    out << "  \"suite\": \"" << escape(suite) << "\",\n";
+    out << "  \"label\": \"" << escape(options.label) << "\",\n";
+    out << "  \"warmup\": " << options.warmup << ",\n";
+    out << "  \"repetitions\": " << options.repetitions << ",\n";
+    out << "  \"results\": [\n";
+    for (size_t i = 0; i < results.size(); ++i) {
+        const Result& result = results[i];
+        const double sum = std::accumulate(result.samples.begin(), result.samples.end(), 0.0);
+        out << "    {\"name\": \"" << escape(result.name) << "\"";
+        if (!result.samples.empty()) {
+            out << ", \"min_s\": " << *std::min_element(result.samples.begin(), result.samples.end())
+                << ", \"median_s\": " << median(result.samples)
+                << ", \"mean_s\": " << sum / result.samples.size()
+                << ", \"max_s\": " << *std::max_element(result.samples.begin(), result.samples.end());
+        }
+        for (const auto& metric : result.metrics) {
+            out << ", \"" << escape(metric.first) << "\": " << metric.second;
+        }
+        out << "}" << (i + 1 < results.size() ? "," : "") << "\n";
+    }
+    out << "  ]\n";
+    out << "}\n";
+    return true;
+}
+
+}  // namespace bench
+
+#endif
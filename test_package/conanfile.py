@@ -1,5 +1,8 @@
 from conans import ConanFile, CMake, tools
+from io import StringIO
+import json
 import os
+import time
 
 
 class TestPackageConan(ConanFile):
@@ -8,8 +11,68 @@ class TestPackageConan(ConanFile):
 
     def build(self):
         cmake = CMake(self)
+        cmake.definitions["OCCT_WITH_MODELING_DATA"] = self.options["opencascade"].with_modeling_data
+        cmake.definitions["OCCT_WITH_MODELING_ALGORITHMS"] = self._with_modeling_algorithms
+        cmake.definitions["OCCT_WITH_DATA_EXCHANGE"] = self.options["opencascade"].with_data_exchange
+        cmake.definitions["OCCT_WITH_TBB"] = self.options["opencascade"].with_tbb
+        cmake.definitions["OCCT_GC_SECTIONS"] = self.options["opencascade"].gc_sections
         cmake.configure()
         cmake.build()
+        self._create_link_report(cmake)
+
+    def _executable_path(self, target):
+        return os.path.join(self.build_folder, "bin", target + (".exe" if self.settings.os == "Windows" else ""))
+
+    def _create_link_report(self, cmake):
+        # Objects are up to date, so relinking executables only measures link time
+        targets = ["test_package"]
+        if self._with_modeling_algorithms:
+            targets.append("benchmark")
+            if self.options["opencascade"].gc_sections:
+                targets.append("benchmark_no_gc_sections")
+        report = {"label": self._benchmark_label, "targets": {}}
+        for target in targets:
+            os.remove(self._executable_path(target))
+            start = time.time()
+            cmake.build(target=target)
+            report["targets"][target] = {
+                "link_time_s": time.time() - start,
+                "size_bytes": os.path.getsize(self._executable_path(target)),
+            }
+            link_command = self._get_link_command(cmake, target)
+            if link_command:
+                report["targets"][target]["link_command_length"] = len(link_command)
+                report["targets"][target]["link_libraries"] = len([arg for arg in link_command.split()
+                                                                   if arg.startswith("-l") or arg.endswith((".a", ".so", ".dylib", ".lib", ".tbd"))])
+        tools.save(os.path.join(self.build_folder, "link_report.json"), json.dumps(report, indent=4))
+        for target, values in report["targets"].items():
+            self.output.info("{}: linked in {:.2f} s, {} bytes, link command of {} characters".format(
+                             target, values["link_time_s"], values["size_bytes"], values.get("link_command_length", "?")))
+
+    def _get_link_command(self, cmake, target):
+        # Length of link command line shows redundant libraries brought by components graph
+        if cmake.generator == "Ninja":
+            output = StringIO()
+            self.run("ninja -t commands {}".format(target), output=output)
+            commands = output.getvalue().strip().splitlines()
+            return commands[-1] if commands else None
+        link_txt = os.path.join(self.build_folder, "CMakeFiles", "{}.dir".format(target), "link.txt")
+        if os.path.isfile(link_txt):
+            return " ".join(tools.load(link_txt).splitlines())
+        return None
+
+    @property
+    def _benchmark_label(self):
+        opencascade_options = self.options["opencascade"]
+        label_items = ["{}={}".format(setting, self.settings.get_safe(setting)) for setting in ["os", "arch", "compiler", "compiler.version", "build_type"]]
+        label_items += ["{}={}".format(option, getattr(opencascade_options, option)) for option in ["shared", "with_tbb", "allocator", "lto", "pgo", "gc_sections"]]
+        if opencascade_options.shared and self.settings.os != "Windows":
+            label_items.append("optimize_dynamic_loading={}".format(opencascade_options.optimize_dynamic_loading))
+        if opencascade_options.with_tbb:
+            label_items.append("parallel_backend={}".format(opencascade_options.parallel_backend))
+        if self.settings.arch == "x86_64":
+            label_items.append("cpu_target={}".format(opencascade_options.cpu_target))
+        return ",".join(label_items)
 
     def test(self):
         if not tools.cross_building(self):
@@ -17,3 +80,72 @@ class TestPackageConan(ConanFile):
             self.run(bin_path, run_environment=True)
             bin_path_global = os.path.join("bin", "test_package_global")
             self.run(bin_path_global, run_environment=True)
+
+            # Benchmarks are always built but only run on demand, test_package is a smoke test by default.
+            # Results can be compared between packages built with different profiles & options
+            if not tools.get_env("OCCT_RUN_BENCHMARKS", False):
+                self.output.info("Benchmarks not run, set OCCT_RUN_BENCHMARKS=1 to run them")
+                return
+            if self._with_modeling_algorithms:
+                self._run_benchmark("benchmark", "benchmark_results.json")
+                self._run_benchmark("scaling_benchmark", "scaling_results.json",
+                                    "--max-threads {}".format(os.environ.get("OCCT_BENCHMARK_MAX_THREADS", "0")))
+            if self.options["opencascade"].with_modeling_data:
+                # Memory managers selected at runtime by MMGT_OPT: 0 = system, 1 = OCCT optimized, 2 = TBB
+                mmgt_opt_values = ["0", "1"]
+                if self.options["opencascade"].allocator == "tbb":
+                    mmgt_opt_values.append("2")
+                for mmgt_opt in mmgt_opt_values:
+                    with tools.environment_append({"MMGT_OPT": mmgt_opt}):
+                        self._run_benchmark("allocator_benchmark", "allocator_results_mmgt_opt_{}.json".format(mmgt_opt))
+            if self.options["opencascade"].shared:
+                self._run_startup_benchmark()
+
+    @property
+    def _opencascade_manifest(self):
+        lib_folder = os.path.join(self.deps_cpp_info["opencascade"].rootpath, "lib")
+        return json.loads(tools.load(os.path.join(lib_folder, "occt_modules.json")))
+
+    @property
+    def _with_modeling_algorithms(self):
+        # Benchmarks rely on primitives, boolean operations & meshing
+        return self.options["opencascade"].with_modeling_algorithms
+
+    @property
+    def _opencascade_shared_libs(self):
+        # Toolkits in topological order (dependencies first), as listed in occt_modules.json manifest
+        opencascade_cpp_info = self.deps_cpp_info["opencascade"]
+        lib_folder = os.path.join(opencascade_cpp_info.rootpath, "lib")
+        toolkits = [toolkit[0] for toolkit in self._opencascade_manifest["toolkits"]]
+        if self.settings.os == "Windows":
+            return [os.path.join(opencascade_cpp_info.rootpath, "bin", "{}.dll".format(toolkit)) for toolkit in toolkits]
+        extension = "dylib" if tools.is_apple_os(self.settings.os) else "so"
+        return [os.path.join(lib_folder, "lib{}.{}".format(toolkit, extension)) for toolkit in toolkits]
+
+    def _run_startup_benchmark(self):
+        # Each run is a new process, so that libraries are really loaded
+        samples = []
+        for run in range(int(os.environ.get("OCCT_BENCHMARK_REPETITIONS", "3"))):
+            run_results_file = os.path.join(self.build_folder, "startup_results_{}.json".format(run))
+            self.run("{} {} \"{}\" {}".format(os.path.join("bin", "startup_benchmark"), run_results_file,
+                                              self._benchmark_label, " ".join(self._opencascade_shared_libs)),
+                     run_environment=True)
+            samples.append(json.loads(tools.load(run_results_file))["results"][0]["min_s"])
+        samples.sort()
+        report = {
+            "suite": "occt_startup",
+            "label": self._benchmark_label,
+            "results": [{"name": "load_libraries", "min_s": samples[0], "median_s": samples[len(samples) // 2],
+                         "max_s": samples[-1], "libraries": len(self._opencascade_shared_libs)}],
+        }
+        tools.save(os.path.join(self.build_folder, "startup_results.json"), json.dumps(report, indent=4))
+
+    def _run_benchmark(self, executable, results_file, extra_args=""):
+        benchmark_args = "--warmup {} --repetitions {} --output {} --label \"{}\" {}".format(
+            os.environ.get("OCCT_BENCHMARK_WARMUP", "1"),
+            os.environ.get("OCCT_BENCHMARK_REPETITIONS", "3"),
+            os.path.join(self.build_folder, results_file),
+            self._benchmark_label,
+            extra_args)
+        bin_path = os.path.join("bin", executable)
+        self.run("{} {}".format(bin_path, benchmark_args), run_environment=True)
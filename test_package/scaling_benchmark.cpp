@@ -0,0 +1,104 @@
+// Multi-core scaling of parallel meshing and parallel boolean operations.
+// Each workload runs with 1, 2, 4 ... N threads, speedup and efficiency are relative to 1 thread.
+
+#include "benchmark_shapes.hpp"
+#include "benchmark_utils.hpp"
+
+#include <BRepMesh_IncrementalMesh.hxx>
+#include <BRepTools.hxx>
+#include <OSD_Parallel.hxx>
+#include <OSD_ThreadPool.hxx>
+
+#ifdef OCCT_BENCHMARK_WITH_TBB
+#include <tbb/global_control.h>
+#include <memory>
+#endif
+
+#include <thread>
+
+namespace {
+
+// Limits the number of threads of the backend used by OSD_Parallel
+class ThreadsLimit {
+public:
+    explicit ThreadsLimit(int nb_threads) {
+        if (OSD_Parallel::ToUseOcctThreads()) {
+            OSD_ThreadPool::DefaultPool()->Init(nb_threads);
+        }
+#ifdef OCCT_BENCHMARK_WITH_TBB
+        else {
+            control_.reset(new tbb::global_control(tbb::global_control::max_allowed_parallelism, nb_threads));
+        }
+#endif
+    }
+
+private:
+#ifdef OCCT_BENCHMARK_WITH_TBB
+    std::unique_ptr<tbb::global_control> control_;
+#endif
+};
+
+std::vector<int> threads_counts(int max_threads) {
+    std::vector<int> counts;
+    for (int count = 1; count < max_threads; count *= 2) {
+        counts.push_back(count);
+    }
+    counts.push_back(max_threads);
+    return counts;
+}
+
+void add_scaling_metrics(std::vector<bench::Result>& results, size_t first, const std::vector<int>& counts) {
+    const double reference = *std::min_element(results[first].samples.begin(), results[first].samples.end());
+    for (size_t i = 0; i < counts.size(); ++i) {
+        bench::Result& result = results[first + i];
+        const double best = *std::min_element(result.samples.begin(), result.samples.end());
+        result.metrics["threads"] = counts[i];
+        result.metrics["speedup"] = reference / best;
+        result.metrics["efficiency"] = reference / best / counts[i];
+    }
+}
+
+}  // namespace
+
+int main(int argc, char** argv) {
+    bench::Options options = bench::parse_options(argc, argv);
+    if (options.max_threads <= 0) {
+        options.max_threads = std::max(1, static_cast<int>(std::thread::hardware_concurrency()));
+    }
+    const std::vector<int> counts = threads_counts(options.max_threads);
+    const std::string backend = OSD_Parallel::ToUseOcctThreads() ? "occt" : "tbb";
+    std::cout << "OSD_Parallel backend: " << backend << std::endl;
+
+    const TopTools_ListOfShape plate = bench::make_plate();
+    const TopTools_ListOfShape holes = bench::make_holes_tools(12);
+    const TopTools_ListOfShape spheres = bench::make_spheres_tools(8);
+    TopoDS_Shape mesh_shape = bench::run_fuse(plate, spheres);
+    if (mesh_shape.IsNull()) {
+        std::cerr << "Boolean operation failed" << std::endl;
+        return 1;
+    }
+
+    std::vector<bench::Result> results;
+    const struct {
+        const char* name;
+        std::function<void()> body;
+        std::function<void()> setup;
+    } workloads[] = {
+        {"parallel_mesh",
+         [&] { BRepMesh_IncrementalMesh mesher(mesh_shape, 0.02, Standard_False, 0.5, Standard_True); },
+         [&] { BRepTools::Clean(mesh_shape); }},
+        {"parallel_cut", [&] { bench::run_cut(plate, holes, true); }, std::function<void()>()},
+        {"parallel_fuse", [&] { bench::run_fuse(plate, spheres, true); }, std::function<void()>()},
+    };
+    for (const auto& workload : workloads) {
+        const size_t first = results.size();
+        for (int count : counts) {
+            ThreadsLimit limit(count);
+            results.push_back(bench::run(options, std::string(workload.name) + "_threads_" + std::to_string(count),
+                                         workload.body, workload.setup));
+        }
+        add_scaling_metrics(results, first, counts);
+    }
+
+    return bench::write_json(options, "occt_scaling_" + backend, results) ? 0 : 1;
+}
@@ -0,0 +1,43 @@
+// Time to load all OpenCASCADE shared libraries, with all symbols bound at load time.
+// Libraries are given in dependency order, one measurement per process.
+
+#include "benchmark_utils.hpp"
+
+#ifdef _WIN32
+#include <windows.h>
+#else
+#include <dlfcn.h>
+#endif
+
+int main(int argc, char** argv) {
+    // Arguments: <output> <label> <library>...
+    if (argc < 3) {
+        std::cerr << "Usage: " << argv[0] << " <output> <label> <library>..." << std::endl;
+        return 1;
+    }
+    bench::Options options;
+    options.warmup = 0;
+    options.repetitions = 1;
+    options.output = argv[1];
+    options.label = argv[2];
+
+    bool ok = true;
+    bench::Result result;
+    result.name = "load_libraries";
+    result.samples.push_back(bench::elapsed_seconds([&] {
+        for (int i = 3; i < argc; ++i) {
+#ifdef _WIN32
+            const bool loaded = LoadLibraryA(argv[i]) != NULL;
+#else
+            const bool loaded = dlopen(argv[i], RTLD_NOW | RTLD_GLOBAL) != NULL;
+#endif
+            if (!loaded) {
+                std::cerr << "Can't load " << argv[i] << std::endl;
+                ok = false;
+            }
+        }
+    }));
+    result.metrics["libraries"] = argc - 3;
+
+    return ok && bench::write_json(options, "occt_startup", std::vector<bench::Result>(1, result)) ? 0 : 1;
+}
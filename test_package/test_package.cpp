@@ -1,14 +1,64 @@
-#include <BRepBuilderAPI_MakeEdge.hxx>
-#include <TopoDS_Edge.hxx>
+#include <gp_Circ.hxx>
+#include <gp_Pnt.hxx>
+
+#ifdef OCCT_TEST_WITH_MODELING_DATA
 #include <GC_MakeCircle.hxx>
+#include <GCPnts_AbscissaPoint.hxx>
+#include <GeomAdaptor_Curve.hxx>
 #include <gce_MakeCirc.hxx>
-#include <gp_Circ.hxx>
+#endif
+
+#ifdef OCCT_TEST_WITH_MODELING_ALGORITHMS
+#include <BRepBuilderAPI_MakeEdge.hxx>
+#include <BRepBuilderAPI_MakeFace.hxx>
+#include <BRepBuilderAPI_MakeWire.hxx>
+#include <BRepGProp.hxx>
+#include <GProp_GProps.hxx>
+#include <TopoDS_Edge.hxx>
+#include <TopoDS_Face.hxx>
+#endif
 
+#include <cmath>
 #include <iostream>
 
+static bool check(const char* what, double value, double expected) {
+    const double tolerance = 1e-9 * std::fabs(expected);
+    if (std::fabs(value - expected) > tolerance) {
+        std::cerr << what << ": got " << value << ", expected " << expected << std::endl;
+        return false;
+    }
+    return true;
+}
+
 int main() {
+    const double radius = 5.0;
+    const double pi = 3.14159265358979323846;
+
+    // Compare against analytical values, so that binaries produced with any
+    // build configuration (pch, unity build etc) are checked to behave the same.
+    // Only modules available in package are tested
+    gp_Circ cir(gp_Ax2(gp_Pnt(0, 0, 0), gp::DZ()), radius);
+    bool ok = check("gp circle length", cir.Length(), 2.0 * pi * radius);
+    ok = check("gp circle area", cir.Area(), pi * radius * radius) && ok;
+
+#ifdef OCCT_TEST_WITH_MODELING_DATA
     gp_Pnt pc(0, 0, 0);
-    gp_Circ cir = gce_MakeCirc(pc, gp::DZ(), 5);
+    cir = gce_MakeCirc(pc, gp::DZ(), radius);
     auto geometry = GC_MakeCircle(cir).Value();
+    ok = check("curve length", GCPnts_AbscissaPoint::Length(GeomAdaptor_Curve(geometry)), 2.0 * pi * radius) && ok;
+
+#ifdef OCCT_TEST_WITH_MODELING_ALGORITHMS
     TopoDS_Edge edge = BRepBuilderAPI_MakeEdge(geometry);
+    TopoDS_Face face = BRepBuilderAPI_MakeFace(BRepBuilderAPI_MakeWire(edge).Wire());
+
+    GProp_GProps edge_props;
+    BRepGProp::LinearProperties(edge, edge_props);
+    GProp_GProps face_props;
+    BRepGProp::SurfaceProperties(face, face_props);
+
+    ok = check("circle length", edge_props.Mass(), 2.0 * pi * radius) && ok;
+    ok = check("disk area", face_props.Mass(), pi * radius * radius) && ok;
+#endif
+#endif
+    return ok ? 0 : 1;
 }